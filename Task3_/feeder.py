@@ -1,9 +1,12 @@
 import os 
+import io
+import zipfile
 import requests 
 
 API_URL_UPLOAD = "http://127.0.0.1:8000/upload_image"
 API_URL_SEARCH = "http://127.0.0.1:8000/search"
 API_URL_DOWNLOAD = "http://127.0.0.1:8000/imagesearch"
+API_URL_BULK_DOWNLOAD = "http://127.0.0.1:8000/bulk_download"
 
 sourcefolder = 'images'
 word = input("Word: ")
@@ -21,12 +24,16 @@ def downloadImage(word):
     response = requests.get(API_URL_SEARCH, params={"word": word})
     data = response.json()
     print(data)
-    
-    response = requests.get(API_URL_DOWNLOAD, params={"image_name": data})
+
+    if not data["results"]:
+        print(" No matches")
+        return
+    name = data["results"][0]["file_name"]
+    response = requests.get(API_URL_DOWNLOAD, params={"image_name": name})
 
     if response.status_code == 200:
         os.makedirs(download_folder, exist_ok=True)
-        save_path = os.path.join(download_folder, data)
+        save_path = os.path.join(download_folder, name)
 
         with open(save_path, "wb") as f:
             f.write(response.content)
@@ -35,11 +42,24 @@ def downloadImage(word):
     else:
         print(f" Failed to download: {response.status_code}")
 
+
+def downloadImages(word, mode="and"):
+    response = requests.get(API_URL_BULK_DOWNLOAD, params={"word": word, "mode": mode, "format": "zip"})
+
+    if response.status_code == 200:
+        os.makedirs(download_folder, exist_ok=True)
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            archive.extractall(download_folder)
+            for name in archive.namelist():
+                print(f" Downloaded: {os.path.join(download_folder, name)}")
+    else:
+        print(f" Failed to download: {response.status_code}")
+
     
 
 
 
 
 
-downloadImage(word)
+downloadImages(word)
 # uploadimage()
\ No newline at end of file
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 import os 
 from dotenv import load_dotenv
 from supabase import create_client, Client
@@ -8,6 +8,14 @@ import base64
 import uuid
 import re
 import requests
+import json
+import zipfile
+import tarfile
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from metrics import instrument, span
+from catalogue import expire_catalogue, load_catalogue
 
 load_dotenv()
 
@@ -17,27 +25,117 @@ url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 supabase: Client = create_client(url, key)
 table_name = 'images'
+catalogue_path = os.environ.get("CATALOGUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), '.images.cat'))
+catalogue_max_age = float(os.environ.get("CATALOGUE_MAX_AGE", "5"))
 
 app = FastAPI()
+instrument(app, "task3")
 
 image_directory = ""
 API_URL = "http://127.0.0.1:8000/images/{image_name}"
 
 
-def find_file_by_word(data: dict, word: str) -> str | None:
-    word = word.lower()
-    for filename, description in data.items():
-        if word in description.lower().split():
-            return filename
-    return None
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
 
-# def find_files_by_word(data: dict, word: str) -> list[str]:
-#     word = word.lower()
-#     matches = []
-#     for filename, description in data.items():
-#         if word in description.lower().split():
-#             matches.append(filename)
-#     return matches
+def find_files_by_words(data: dict, words: list[str], mode: str = "and") -> list[tuple[str, int]]:
+    terms = {w for word in words for w in tokenize(word)}
+    if not terms:
+        return []
+    matches = []
+    for filename, description in data.items():
+        counts = {}
+        for token in tokenize(description):
+            if token in terms:
+                counts[token] = counts.get(token, 0) + 1
+        if not counts:
+            continue
+        if mode == "and" and len(counts) != len(terms):
+            continue
+        # files hitting more distinct terms rank first, then by total hits
+        score = len(counts) * 1000 + sum(counts.values())
+        matches.append((filename, score))
+    matches.sort(key=lambda m: (-m[1], m[0]))
+    return matches
+
+
+def encode_cursor(score: int, filename: str) -> str:
+    raw = json.dumps([score, filename]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("utf-8")
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    try:
+        score, filename = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+        return int(score), str(filename)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def paginate(matches: list[tuple[str, int]], cursor: str | None, limit: int):
+    if cursor:
+        # keyset pagination on (-score, filename) so pages stay stable as rows are added
+        last_score, last_name = decode_cursor(cursor)
+        matches = [m for m in matches if (-m[1], m[0]) > (-last_score, last_name)]
+    page = matches[:limit]
+    next_cursor = None
+    if len(matches) > limit and page:
+        next_cursor = encode_cursor(page[-1][1], page[-1][0])
+    return page, next_cursor
+
+
+def load_description_map():
+    # shared read-only mapping of the on-disk catalogue; at most every CATALOGUE_MAX_AGE
+    # seconds it is synced, fetching only rows inserted since the last sync
+    with span("storage"):
+        return load_catalogue(catalogue_path, lambda: supabase.table(table_name), catalogue_max_age,
+                              source=f"{url}/{table_name}").descriptions()
+
+
+def parse_words(word: str, words: list[str] | None) -> list[str]:
+    terms = list(words or [])
+    if word:
+        terms.extend(word.split())
+    return terms
+
+
+class _ChunkWriter:
+    # unseekable sink so zipfile/tarfile write straight into the response stream
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_archive(filenames: list[str], archive_format: str):
+    sink = _ChunkWriter()
+    if archive_format == "zip":
+        archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    else:
+        archive = tarfile.open(fileobj=sink, mode="w|")
+    with archive:
+        for filename in filenames:
+            name = os.path.basename(filename)
+            image_path = os.path.join('images', name)
+            if not os.path.isfile(image_path):
+                continue
+            if archive_format == "zip":
+                archive.write(image_path, arcname=name)
+            else:
+                archive.add(image_path, arcname=name)
+            yield sink.drain()
+    yield sink.drain()
 
 
 @app.get('/')
@@ -50,57 +148,83 @@ def health():
 
 @app.post('/upload_image')
 async def upload_image(image: UploadFile  = File(...), prompt: str = "You are an expert image cataloger. Your task is to provide a detailed, single-paragraph description of the following image. Focus on creating a description rich with searchable keywords. In your description, identify and include: The main subject and any prominent figures or objects. The setting and environment (e.g., indoor, outdoor, city, forest, beach). Specific details and smaller objects in the background and foreground. Key colors, lighting, and textures. The overall mood, atmosphere, and any actions taking place. Combine these elements into a fluid, descriptive paragraph. Do not use lists or bullet points in your final output" ):
-    image_byte = await image.read()
-    base64_image = base64.b64encode(image_byte).decode('utf-8')
+    with span("upload"):
+        image_byte = await image.read()
+    with span("encode"):
+        base64_image = base64.b64encode(image_byte).decode('utf-8')
     content_type = image.content_type
 
     filename = image.filename
 
-    chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt,
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
+    with span("inference"):
+        chat_completion = client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prompt,
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
                                
-                                "url": f"data:{content_type};base64,{base64_image}"
+                                    "url": f"data:{content_type};base64,{base64_image}"
+                                },
                             },
-                        },
-                    ],
-                }
-            ],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            max_tokens=1024,
-        )
+                        ],
+                    }
+                ],
+                model="meta-llama/llama-4-scout-17b-16e-instruct",
+                max_tokens=1024,
+            )
     response_content = chat_completion.choices[0].message.content
     random_uuid = uuid.uuid4()
 
-    response = (supabase.table(table_name).insert
-                ({"id": str(random_uuid), "file_name":filename, "Description": response_content }).execute())
+    with span("storage"):
+        response = (supabase.table(table_name).insert
+                    ({"id": str(random_uuid), "file_name":filename, "Description": response_content }).execute())
+    expire_catalogue(catalogue_path)
     
     return(response)
     # return {"analysis": response_content}
 
 @app.get("/search")
-async def search(word: str = ""):
-    response = supabase.table(table_name).select('file_name,Description').execute()
-    filename_description_map = {item['file_name']: item['Description'] for item in response.data}
+async def search(word: str = "", words: list[str] | None = Query(None), mode: str = "and", limit: int = 20, cursor: str | None = None):
+    if mode not in ("and", "or"):
+        raise HTTPException(status_code=400, detail="mode must be 'and' or 'or'.")
+    limit = max(1, min(limit, 500))
+    data = load_description_map()
+    with span("search"):
+        matches = find_files_by_words(data, parse_words(word, words), mode)
+        page, next_cursor = paginate(matches, cursor, limit)
+
+    return {
+        "results": [{"file_name": filename, "score": score} for filename, score in page],
+        "total": len(matches),
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/bulk_download")
+async def bulk_download(word: str = "", words: list[str] | None = Query(None), mode: str = "and", format: str = "zip", limit: int = 1000):
+    if mode not in ("and", "or"):
+        raise HTTPException(status_code=400, detail="mode must be 'and' or 'or'.")
+    if format not in ("zip", "tar"):
+        raise HTTPException(status_code=400, detail="format must be 'zip' or 'tar'.")
+    matches = find_files_by_words(load_description_map(), parse_words(word, words), mode)[:max(1, limit)]
+    if not matches:
+        raise HTTPException(status_code=404, detail="No matching images.")
+
+    filenames = [filename for filename, _ in matches]
+    media_type = "application/zip" if format == "zip" else "application/x-tar"
+    return StreamingResponse(
+        stream_archive(filenames, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="matches.{format}"'},
+    )
 
-    found = find_file_by_word(filename_description_map, word)
-    
-    if found:
-        return found
-    else:
-        return "None"
-        
-    
- 
 
 @app.get("/imagesearch")
 async def get_image(image_name: str):
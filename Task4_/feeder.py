@@ -1,12 +1,20 @@
 from supabase import create_client
 import os 
 from dotenv import load_dotenv
+import sys
 import ollama
 import requests
+import cv2
+import time
+from matcher import CascadeIndex
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from catalogue import load_catalogue
 
 load_dotenv()
 
 imagetosearch = 'imagetosearch/lotofthings.jpg'
+catalogue_folder = 'images'
 filename = os.path.basename(imagetosearch)
 DESCRIPTION_URL = "http://127.0.0.1:8000/upload_image"
 API_URL_DOWNLOAD="http://127.0.0.1:8000/imagesearch"
@@ -17,45 +25,61 @@ key: str = os.environ.get("SUPABASE_KEY")
 supabase = create_client(url, key)
 table_name = 'images'
 
-response = (supabase.table(table_name).select("*").execute())
+catalogue_path = os.environ.get("CATALOGUE_PATH", '.images.cat')
 
-filename_description_map = {item['file_name']: item['Description'] for item in response.data}
+# local replica of the table; each run only fetches rows added since the last one
+filename_description_map = load_catalogue(
+    catalogue_path, lambda: supabase.table(table_name), source=f"{url}/{table_name}"
+).descriptions()
 
 # print(filename_description_map)
 
 
+def describe_query():
+    with open(imagetosearch, 'rb') as file_content:
+        payload = {'image': (filename, file_content)}
+        response = requests.post(DESCRIPTION_URL, files=payload )
+        return response.json()
+
+
+def llm_similarity(a, b):
+    prompt = (
+        "Rate the similarity between these two image descriptions on a scale of 0 to 10 (0 = not similar, 10 = identical). "
+        "Return only the number.\n\n"
+        f"A: {a}\n"
+        f"B: {b}"
+    )
+    res = ollama.chat(model="gpt-oss", messages=[{"role": "user", "content": prompt}])
+    content = res.get("message", {}).get("content", "").strip()
+    s = ''.join(ch for ch in content if (ch.isdigit() or ch == '.'))
+    try:
+        return float(s) if s else 0.0
+    except:
+        return 0.0
+
+
+def llm_rank(names):
+    # final cascade stage: only the few verified candidates reach the LLM
+    data = describe_query()
+    return {name: llm_similarity(data, filename_description_map[name]) / 10
+            for name in names if name in filename_description_map}
 
-with open(imagetosearch, 'rb') as file_content:
-    payload = {'image': (filename, file_content)}
-    response = requests.post(DESCRIPTION_URL, files=payload )
-    data =  response.json()
-    best_file = None
-    best_score = -1.0
-    for fname, desc in filename_description_map.items():
-        prompt = (
-            "Rate the similarity between these two image descriptions on a scale of 0 to 10 (0 = not similar, 10 = identical). "
-            "Return only the number.\n\n"
-            f"A: {data}\n"
-            f"B: {desc}"
-        )
-        res = ollama.chat(model="gpt-oss", messages=[{"role": "user", "content": prompt}])
-        content = res.get("message", {}).get("content", "").strip()
-        s = ''.join(ch for ch in content if (ch.isdigit() or ch == '.'))
-        try:
-            score = float(s) if s else 0.0
-        except:
-            score = 0.0
-        if score > best_score:
-            best_score = score
-            best_file = fname
-    print(best_file)
+
+start = time.perf_counter()
+index = CascadeIndex.build(catalogue_folder)
+print(f"index: {len(index.names)} images in {time.perf_counter() - start:.2f}s")
+
+result = index.search(cv2.imread(imagetosearch), llm=llm_rank)
+print(result["timings"])
+best_file = result["results"][0]["file_name"] if result["results"] else None
+print(best_file)
 
 def image_downloader(image_name):
-    response = requests.get(API_URL_DOWNLOAD, params={"image_name": data})
+    response = requests.get(API_URL_DOWNLOAD, params={"image_name": image_name})
 
     if response.status_code == 200:
         os.makedirs(download_folder, exist_ok=True)
-        save_path = os.path.join(download_folder, data)
+        save_path = os.path.join(download_folder, image_name)
 
         with open(save_path, "wb") as f:
             f.write(response.content)
@@ -70,5 +94,3 @@ def image_downloader(image_name):
 
 
 image_downloader(best_file)
-
-
@@ -7,6 +7,10 @@ from groq import Groq
 import base64
 import uuid
 import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from metrics import instrument, span
 
 load_dotenv()
 
@@ -18,6 +22,7 @@ supabase: Client = create_client(url, key)
 table_name = ''
 
 app = FastAPI()
+instrument(app, "task4")
 
 
 
@@ -63,34 +68,37 @@ def health():
 
 @app.post('/upload_image')
 async def upload_image(image: UploadFile  = File(...), prompt: str = "You are an expert image cataloger. Your task is to provide a detailed, single-paragraph description of the following image. Focus on creating a description rich with searchable keywords. In your description, identify and include: The main subject and any prominent figures or objects. The setting and environment (e.g., indoor, outdoor, city, forest, beach). Specific details and smaller objects in the background and foreground. Key colors, lighting, and textures. The overall mood, atmosphere, and any actions taking place. Combine these elements into a fluid, descriptive paragraph. Do not use lists or bullet points in your final output" ):
-    image_byte = await image.read()
-    base64_image = base64.b64encode(image_byte).decode('utf-8')
+    with span("upload"):
+        image_byte = await image.read()
+    with span("encode"):
+        base64_image = base64.b64encode(image_byte).decode('utf-8')
     content_type = image.content_type
 
     filename = image.filename
 
-    chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt,
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
+    with span("inference"):
+        chat_completion = client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prompt,
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
                                
-                                "url": f"data:{content_type};base64,{base64_image}"
+                                    "url": f"data:{content_type};base64,{base64_image}"
+                                },
                             },
-                        },
-                    ],
-                }
-            ],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            max_tokens=1024,
-        )
+                        ],
+                    }
+                ],
+                model="meta-llama/llama-4-scout-17b-16e-instruct",
+                max_tokens=1024,
+            )
     response_content = chat_completion.choices[0].message.content
   
     return JSONResponse(response_content)
@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from catalogue import open_catalogue, write_catalogue
+
+# Cascaded image matcher: each stage keeps a fixed budget of candidates for the
+# next, more expensive one, so only the first (vectorised) stage touches the
+# whole catalogue.
+#   1. hash     pHash + dHash Hamming distance over packed uint64s
+#   2. hist     HSV histogram correlation as one matrix-vector product
+#   3. orb      ORB ratio-test matches + RANSAC homography inliers
+#   4. llm      optional caller-supplied scorer (e.g. description similarity)
+# Hash/histogram features are computed from the images in the catalogue folder
+# and saved next to it as a memory-mapped catalogue (shared/catalogue.py), so
+# loading is near-instant and processes share the pages.
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+HIST_BINS = [8, 8, 8]
+HIST_RANGES = [0, 180, 0, 256, 0, 256]
+ORB_FEATURES = 1000
+ORB_MAX_SIDE = 800
+ORB_CACHE_SIZE = int(os.environ.get("ORB_CACHE_SIZE", "256"))  # candidates whose ORB features stay in memory
+
+# cv2.imread flags that decode at 1/2, 1/4 and 1/8 size (JPEG scales in the DCT)
+_REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def gray(x):
+    return cv2.cvtColor(x, cv2.COLOR_BGR2GRAY) if x.ndim == 3 else x
+
+
+def pack_bits(bits: np.ndarray) -> np.uint64:
+    return np.packbits(bits.astype(np.uint8)).view(">u8")[0].astype(np.uint64)
+
+
+def dhash(x) -> np.uint64:
+    g = cv2.resize(gray(x), (9, 8), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return pack_bits((g[:, 1:] > g[:, :-1]).flatten())
+
+
+def phash(x) -> np.uint64:
+    g = cv2.resize(gray(x), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    d = cv2.dct(g)[:8, :8]
+    med = np.median(d[1:].flatten())
+    b = (d > med).astype(np.uint8)
+    b[0, 0] = 1
+    return pack_bits(b.flatten())
+
+
+def hamming(hashes: np.ndarray, query: np.uint64) -> np.ndarray:
+    x = np.bitwise_xor(hashes, query)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POPCOUNT[x.view(np.uint8)].reshape(len(hashes), 8).sum(axis=1)
+
+
+def hist_vector(bgr) -> np.ndarray:
+    h = cv2.calcHist([cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)], [0, 1, 2], None, HIST_BINS, HIST_RANGES)
+    h = cv2.normalize(h, h).flatten().astype(np.float32)
+    h -= h.mean()
+    norm = np.linalg.norm(h)
+    return h / norm if norm > 0 else h
+
+
+def read_for_orb(path: str, max_side: int = 0):
+    # ORB works at ORB_MAX_SIDE anyway, so decode at the smallest scale that stays above it
+    for factor, flag in _REDUCED:
+        if max_side and max_side // factor >= ORB_MAX_SIDE:
+            return cv2.imread(path, flag)
+    return cv2.imread(path)
+
+
+def orb_features(bgr):
+    g = gray(bgr)
+    scale = min(1.0, ORB_MAX_SIDE / max(g.shape))
+    if scale < 1.0:
+        g = cv2.resize(g, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.ORB_create(ORB_FEATURES).detectAndCompute(g, None)
+
+
+def orb_score(query_features, candidate_features) -> float:
+    k1, d1 = query_features
+    k2, d2 = candidate_features
+    if d1 is None or d2 is None or len(k1) < 2 or len(k2) < 2:
+        return 0.0
+    matches = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(d1, d2, k=2)
+    good = [m[0] for m in matches if len(m) == 2 and m[0].distance < 0.75 * m[1].distance]
+    if len(good) < 4:
+        return len(good) / max(len(k1), len(k2))
+    src = np.float32([k1[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+    dst = np.float32([k2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+    _, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+    verified = int(inliers.sum()) if inliers is not None else 0
+    return verified / max(len(k1), len(k2))
+
+
+class CascadeIndex:
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.names: list[str] = []
+        self.phashes = np.zeros(0, np.uint64)
+        self.dhashes = np.zeros(0, np.uint64)
+        self.hists = np.zeros((0, int(np.prod(HIST_BINS))), np.float32)
+        self.sides = np.zeros(0, np.uint32)
+        self._orb_cache: OrderedDict = OrderedDict()
+
+    @classmethod
+    def build(cls, folder: str, cache: str | None = None) -> "CascadeIndex":
+        index = cls(folder)
+        cache = cache or os.path.join(folder, ".cascade_index.cat")
+        if os.path.exists(cache):
+            index._load(cache)
+        names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTENSIONS))
+        present, indexed = set(names), set(index.names)
+        removed = len(indexed - present)
+        if removed:
+            index.keep([i for i, n in enumerate(index.names) if n in present])
+        missing = [n for n in names if n not in indexed]
+        if missing:
+            # a generator, so only one decoded image is held at a time
+            index.add((n, cv2.imread(os.path.join(folder, n))) for n in missing)
+        if missing or removed:
+            index.save(cache)
+        return index
+
+    def keep(self, rows: list[int]) -> None:
+        self.names = [self.names[i] for i in rows]
+        self.phashes, self.dhashes, self.hists = self.phashes[rows], self.dhashes[rows], self.hists[rows]
+        self.sides = self.sides[rows]
+        self._orb_cache.clear()
+
+    def candidate_features(self, i: int):
+        name = self.names[i]
+        features = self._orb_cache.get(name)
+        if features is not None:
+            self._orb_cache.move_to_end(name)
+            return features
+        candidate = read_for_orb(os.path.join(self.folder, name), int(self.sides[i]))
+        features = orb_features(candidate) if candidate is not None else ((), None)
+        self._orb_cache[name] = features
+        if len(self._orb_cache) > ORB_CACHE_SIZE:
+            self._orb_cache.popitem(last=False)
+        return features
+
+    def add(self, items) -> None:
+        names, ph, dh, hists, sides = [], [], [], [], []
+        for name, bgr in items:
+            if bgr is None:
+                continue
+            names.append(name)
+            ph.append(phash(bgr))
+            dh.append(dhash(bgr))
+            hists.append(hist_vector(bgr))
+            sides.append(max(bgr.shape[:2]))
+        if not names:
+            return
+        self.names.extend(names)
+        self.phashes = np.concatenate([self.phashes, np.array(ph, np.uint64)])
+        self.dhashes = np.concatenate([self.dhashes, np.array(dh, np.uint64)])
+        self.hists = np.concatenate([self.hists, np.stack(hists)])
+        self.sides = np.concatenate([self.sides, np.array(sides, np.uint32)])
+
+    def save(self, path: str) -> None:
+        write_catalogue(path, self.names,
+                        arrays={"phash": self.phashes, "dhash": self.dhashes, "hist": self.hists, "side": self.sides})
+
+    def _load(self, path: str) -> None:
+        # arrays stay read-only views of the mapping until add() copies them
+        data = open_catalogue(path)
+        self.names = data.names()
+        self.phashes, self.dhashes, self.hists = data.array("phash"), data.array("dhash"), data.array("hist")
+        # caches written before sizes were stored decode candidates at full size
+        self.sides = data.array("side") if "side" in data.arrays else np.zeros(len(self.names), np.uint32)
+
+    def search(self, bgr, hash_budget: int = 300, hist_budget: int = 30, verify_budget: int = 10,
+               llm=None, llm_budget: int = 3) -> dict:
+        # llm, if given, is called as llm(names) -> {name: score in [0, 1]} on the
+        # top `llm_budget` verified candidates and decides their final order
+        timings = {}
+        start = time.perf_counter()
+        q_ph, q_dh = phash(bgr), dhash(bgr)
+        dist = hamming(self.phashes, q_ph).astype(np.int32) + hamming(self.dhashes, q_dh)
+        k = min(hash_budget, len(dist))
+        idx = np.argpartition(dist, k - 1)[:k] if k else np.zeros(0, np.int64)
+        timings["hash_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        hist = (self.hists[idx] @ hist_vector(bgr) + 1) / 2
+        hash_sim = 1 - dist[idx] / 128
+        coarse = 0.5 * hist + 0.5 * hash_sim
+        k = min(hist_budget, len(idx))
+        order = np.argsort(-coarse)[:k]
+        idx, coarse = idx[order], coarse[order]
+        timings["hist_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        query_features = orb_features(bgr)
+        scored = []
+        for i, c in zip(idx[:verify_budget], coarse[:verify_budget]):
+            orb = orb_score(query_features, self.candidate_features(i))
+            scored.append({"file_name": self.names[i], "coarse": float(c), "orb": orb})
+        scored.sort(key=lambda r: (r["orb"], r["coarse"]), reverse=True)
+        timings["orb_ms"] = (time.perf_counter() - start) * 1000
+
+        if llm is not None and scored:
+            start = time.perf_counter()
+            top = scored[:llm_budget]
+            llm_scores = llm([r["file_name"] for r in top])
+            for r in top:
+                r["llm"] = float(llm_scores.get(r["file_name"], 0.0))
+            top.sort(key=lambda r: (r["llm"], r["orb"]), reverse=True)
+            scored = top + scored[llm_budget:]
+            timings["llm_ms"] = (time.perf_counter() - start) * 1000
+
+        return {"results": scored, "timings": timings, "catalogue": len(self.names)}
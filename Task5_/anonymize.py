@@ -0,0 +1,367 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from video import MaskTracker, coverage, open_writer, polygon_mask
+
+# Batch person anonymization (the Task5 notebook as a library/CLI).
+#   python anonymize.py images/ out/ --model n --batch 8
+#   python anonymize.py footage.mp4 out.mp4 --model s
+#   python anonymize.py footage.mp4 out.mp4 --model s --stride 10 --track flow --evaluate 300
+# Decode, inference and blur/encode run concurrently: a reader thread fills a
+# bounded queue, the model consumes batches, and a worker pool blurs and writes.
+
+PERSON_CLASS = 0  # COCO
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+BLUR_KSIZE = 51
+BLUR_SIGMA = 30
+
+
+def load_model(size: str = "x") -> YOLO:
+    name = size if size.endswith(".pt") else f"yolov8{size}-seg.pt"
+    return YOLO(name)
+
+
+def person_polygons(result) -> list[np.ndarray]:
+    if result.masks is None or result.boxes is None:
+        return []
+    classes = result.boxes.cls.cpu().numpy().astype(int)
+    return [
+        np.asarray(seg, dtype=np.int32)
+        for seg, cls in zip(result.masks.xy, classes)
+        if cls == PERSON_CLASS and len(seg) >= 3
+    ]
+
+
+def merge_boxes(boxes: list[list[int]]) -> list[list[int]]:
+    merged = True
+    while merged:
+        merged = False
+        out: list[list[int]] = []
+        for box in boxes:
+            for other in out:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[:] = [min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3])]
+                    merged = True
+                    break
+            else:
+                out.append(list(box))
+        boxes = out
+    return boxes
+
+
+def blur_people(img: np.ndarray, polygons: list[np.ndarray], ksize: int = BLUR_KSIZE, sigma: float = BLUR_SIGMA,
+                margin: int = 0) -> np.ndarray:
+    if not polygons:
+        return img
+    h, w = img.shape[:2]
+    pad = ksize // 2 + margin
+    boxes = []
+    for poly in polygons:
+        x, y, bw, bh = cv2.boundingRect(poly)
+        boxes.append([max(0, x - pad), max(0, y - pad), min(w, x + bw + pad), min(h, y + bh + pad)])
+
+    out = img.copy()
+    # blur only inside the (merged) person boxes rather than the whole frame
+    for x0, y0, x1, y1 in merge_boxes(boxes):
+        region = img[y0:y1, x0:x1]
+        mask = np.zeros(region.shape[:2], dtype=np.uint8)
+        shifted = [poly - (x0, y0) for poly in polygons]
+        cv2.fillPoly(mask, shifted, 255)
+        if margin:
+            # grow the mask to absorb tracking drift between keyframes
+            cv2.polylines(mask, shifted, True, 255, thickness=2 * margin + 1)
+        blurred = cv2.GaussianBlur(region, (ksize, ksize), sigma)
+        sel = mask == 255
+        out[y0:y1, x0:x1][sel] = blurred[sel]
+    return out
+
+
+def prefetch(iterable, maxsize: int):
+    # run a producer in a background thread so decode overlaps with inference
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                q.put(item)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        yield item
+
+
+def batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Anonymizer:
+    def __init__(self, model_size: str = "x", batch_size: int = 8, imgsz: int = 640, conf: float = 0.25,
+                 device: str = "cpu", workers: int = 2, ksize: int = BLUR_KSIZE, sigma: float = BLUR_SIGMA,
+                 margin: int = 0):
+        self.model = load_model(model_size)
+        self.batch_size = max(1, batch_size)
+        self.imgsz = imgsz
+        self.conf = conf
+        self.device = device
+        self.workers = max(1, workers)
+        self.ksize = ksize | 1
+        self.sigma = sigma
+        self.margin = margin
+        self.stats = {"frames": 0, "people": 0, "keyframes": 0, "decode_s": 0.0, "inference_s": 0.0,
+                      "tracking_s": 0.0, "wall_s": 0.0}
+
+    def detect(self, frames: list[np.ndarray]) -> list[list[np.ndarray]]:
+        start = time.perf_counter()
+        results = self.model.predict(frames, imgsz=self.imgsz, conf=self.conf, device=self.device,
+                                     classes=[PERSON_CLASS], verbose=False)
+        self.stats["inference_s"] += time.perf_counter() - start
+        self.stats["keyframes"] += len(frames)
+        return [person_polygons(r) for r in results]
+
+    def redact(self, frame: np.ndarray, polygons: list[np.ndarray], margin: int = 0) -> np.ndarray:
+        return blur_people(frame, polygons, self.ksize, self.sigma, margin)
+
+    def batched_detections(self, items):
+        for batch in batched(prefetch(items, self.batch_size * 2), self.batch_size):
+            frames = [f for _, f in batch]
+            for (key, frame), polygons in zip(batch, self.detect(frames)):
+                yield key, frame, polygons, False
+
+    def tracked_detections(self, items, stride: int, track: str = "flow"):
+        # full segmentation every `stride` frames, tracked polygons in between
+        tracker = MaskTracker(track)
+        for index, (key, frame) in enumerate(prefetch(items, self.batch_size * 2)):
+            if index % stride == 0:
+                polygons = self.detect([frame])[0]
+                tracker.reset(frame, polygons)
+                yield key, frame, polygons, False
+            else:
+                start = time.perf_counter()
+                polygons = tracker.update(frame)
+                self.stats["tracking_s"] += time.perf_counter() - start
+                yield key, frame, polygons, True
+
+    def _redact_and_encode(self, key, frame, polygons, tracked, encode):
+        out = self.redact(frame, polygons, self.margin if tracked else 0)
+        if encode is not None:
+            encode(key, out)
+        return out
+
+    def _run(self, detections, encode=None, sink=None) -> dict:
+        # detections yields (key, frame, polygons, tracked). encode(key, frame) runs
+        # on the worker pool; sink(key, frame) runs on one writer thread in input order.
+        start = time.perf_counter()
+        pending: "queue.Queue" = queue.Queue(maxsize=self.batch_size * 4)
+        done = object()
+        errors = []
+
+        def drain():
+            while True:
+                item = pending.get()
+                if item is done:
+                    return
+                key, future = item
+                try:
+                    out = future.result()
+                    if sink is not None:
+                        sink(key, out)
+                except Exception as e:
+                    errors.append((key, e))
+
+        writer = threading.Thread(target=drain, daemon=True)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for key, frame, polygons, tracked in detections:
+                    self.stats["frames"] += 1
+                    self.stats["people"] += len(polygons)
+                    pending.put((key, pool.submit(self._redact_and_encode, key, frame, polygons, tracked, encode)))
+        finally:
+            pending.put(done)
+            writer.join()
+        self.stats["wall_s"] += time.perf_counter() - start
+        self.stats["errors"] = self.stats.get("errors", 0) + len(errors)
+        for key, e in errors[:10]:
+            print(f" Failed: {key}: {e}")
+        return self.stats
+
+    def process_images(self, src_dir: str, dst_dir: str, skip_existing: bool = False) -> dict:
+        os.makedirs(dst_dir, exist_ok=True)
+        names = sorted(n for n in os.listdir(src_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+        if skip_existing:
+            names = [n for n in names if not os.path.exists(os.path.join(dst_dir, n))]
+
+        def read():
+            for name in names:
+                start = time.perf_counter()
+                img = cv2.imread(os.path.join(src_dir, name))
+                self.stats["decode_s"] += time.perf_counter() - start
+                if img is not None:
+                    yield name, img
+
+        return self._run(self.batched_detections(read()),
+                         encode=lambda name, img: cv2.imwrite(os.path.join(dst_dir, name), img))
+
+    def process_video(self, src: str, dst: str, stride: int = 1, track: str = "flow", encoder: str = "auto",
+                      fourcc: str = "mp4v") -> dict:
+        cap = cv2.VideoCapture(src)
+        if not cap.isOpened():
+            raise RuntimeError(f"cannot open video: {src}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        writer = open_writer(dst, fps, size, encoder, fourcc)
+
+        def read():
+            index = 0
+            while True:
+                start = time.perf_counter()
+                ok, frame = cap.read()
+                self.stats["decode_s"] += time.perf_counter() - start
+                if not ok:
+                    return
+                yield index, frame
+                index += 1
+
+        if stride > 1:
+            detections = self.tracked_detections(read(), stride, track)
+        else:
+            detections = self.batched_detections(read())
+        try:
+            return self._run(detections, sink=lambda _, frame: writer.write(frame))
+        finally:
+            cap.release()
+            writer.release()
+
+
+def read_frames(src: str, limit: int) -> list[np.ndarray]:
+    cap = cv2.VideoCapture(src)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def evaluate_video(anonymizer: Anonymizer, src: str, stride: int, track: str = "flow", limit: int = 300) -> dict:
+    # Compares keyframe+tracking against segmenting every frame on the first
+    # `limit` frames: detection throughput and how well tracked masks cover the
+    # per-frame masks. Blur/encode is excluded so only the detection path is timed.
+    frames = read_frames(src, limit)
+    if not frames:
+        raise RuntimeError(f"no frames read from {src}")
+    items = list(enumerate(frames))
+
+    start = time.perf_counter()
+    baseline = [p for _, _, p, _ in anonymizer.batched_detections(iter(items))]
+    baseline_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tracked = [(p, t) for _, _, p, t in anonymizer.tracked_detections(iter(items), stride, track)]
+    tracked_s = time.perf_counter() - start
+
+    shape = frames[0].shape[:2]
+    scores = []
+    for ref, (pred, was_tracked) in zip(baseline, tracked):
+        if not was_tracked:
+            continue
+        ref_mask = polygon_mask(shape, ref)
+        pred_mask = polygon_mask(shape, pred)
+        if anonymizer.margin:
+            size = 2 * anonymizer.margin + 1
+            pred_mask = cv2.dilate(pred_mask.astype(np.uint8), np.ones((size, size), np.uint8)).astype(bool)
+        scores.append(coverage(ref_mask, pred_mask))
+
+    def mean(key):
+        return float(np.mean([s[key] for s in scores])) if scores else 0.0
+
+    return {
+        "frames": len(frames),
+        "stride": stride,
+        "track": track,
+        "baseline_fps": len(frames) / baseline_s,
+        "tracked_fps": len(frames) / tracked_s,
+        "speedup": baseline_s / tracked_s,
+        "mean_miss": mean("miss"),
+        "max_miss": max((s["miss"] for s in scores), default=0.0),
+        "mean_excess": mean("excess"),
+        "mean_iou": mean("iou"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blur people in a directory of images or a video.")
+    parser.add_argument("src", help="image directory or video file")
+    parser.add_argument("dst", help="output directory (images) or output video file")
+    parser.add_argument("--model", default="x", help="YOLOv8 seg size n/s/m/l/x or a .pt path")
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--skip-existing", action="store_true")
+    parser.add_argument("--stride", type=int, default=1, help="video: segment every Nth frame, track in between")
+    parser.add_argument("--track", choices=["flow", "box"], default="flow")
+    parser.add_argument("--margin", type=int, default=8, help="video: extra blur margin (px) on tracked frames")
+    parser.add_argument("--encoder", choices=["auto", "ffmpeg", "opencv"], default="auto")
+    parser.add_argument("--evaluate", type=int, default=0, metavar="N",
+                        help="video: compare against full inference on the first N frames and exit")
+    parser.add_argument("--report", help="write the evaluation/run report as JSON")
+    args = parser.parse_args()
+
+    anonymizer = Anonymizer(args.model, args.batch, args.imgsz, args.conf, args.device, args.workers,
+                            margin=args.margin)
+    if args.evaluate:
+        report = evaluate_video(anonymizer, args.src, max(2, args.stride), args.track, args.evaluate)
+        print(f"{report['frames']} frames, stride {report['stride']} ({report['track']}): "
+              f"{report['tracked_fps']:.2f} fps vs {report['baseline_fps']:.2f} fps full inference "
+              f"({report['speedup']:.1f}x), mask miss {report['mean_miss']:.3f} (max {report['max_miss']:.3f}), "
+              f"IoU {report['mean_iou']:.3f}")
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    if os.path.isdir(args.src):
+        stats = anonymizer.process_images(args.src, args.dst, args.skip_existing)
+    elif args.src.lower().endswith(VIDEO_EXTENSIONS):
+        stats = anonymizer.process_video(args.src, args.dst, args.stride, args.track, args.encoder)
+    else:
+        raise SystemExit(f"unsupported input: {args.src}")
+
+    fps = stats["frames"] / stats["wall_s"] if stats["wall_s"] else 0.0
+    print(f"{stats['frames']} frames, {stats['people']} people, {fps:.2f} frames/s "
+          f"(inference {stats['inference_s']:.1f}s on {stats['keyframes']} frames, tracking {stats['tracking_s']:.1f}s, "
+          f"decode {stats['decode_s']:.1f}s, wall {stats['wall_s']:.1f}s)")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(stats, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
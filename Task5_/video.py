@@ -0,0 +1,117 @@
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+# Helpers for the video mode of anonymize.py: propagating person polygons
+# between keyframes, a streaming ffmpeg writer, and mask coverage metrics.
+
+
+class MaskTracker:
+    # "flow" moves every polygon vertex with pyramidal Lucas-Kanade optical flow,
+    # "box" shifts each polygon rigidly by the median motion of its vertices.
+    # Flow runs on a downscaled grayscale copy so it stays far cheaper than
+    # a segmentation pass.
+
+    def __init__(self, mode: str = "flow", max_side: int = 640):
+        if mode not in ("flow", "box"):
+            raise ValueError(f"unknown tracking mode: {mode}")
+        self.mode = mode
+        self.max_side = max_side
+        self.scale = 1.0
+        self.prev_gray = None
+        self.polygons: list[np.ndarray] = []
+
+    def _gray(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        self.scale = min(1.0, self.max_side / max(h, w))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale < 1.0:
+            gray = cv2.resize(gray, (int(w * self.scale), int(h * self.scale)), interpolation=cv2.INTER_AREA)
+        return gray
+
+    def reset(self, frame: np.ndarray, polygons: list[np.ndarray]) -> None:
+        self.prev_gray = self._gray(frame)
+        self.polygons = [p.astype(np.float32) for p in polygons]
+
+    def update(self, frame: np.ndarray) -> list[np.ndarray]:
+        gray = self._gray(frame)
+        if self.prev_gray is None or not self.polygons:
+            self.prev_gray = gray
+            return [p.astype(np.int32) for p in self.polygons]
+
+        sizes = [len(p) for p in self.polygons]
+        pts = np.concatenate(self.polygons).reshape(-1, 1, 2) * self.scale
+        nxt, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray, gray, pts.astype(np.float32), None,
+            winSize=(21, 21), maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+        )
+        motion = (nxt - pts).reshape(-1, 2) / self.scale
+        ok = status.reshape(-1).astype(bool)
+
+        moved = []
+        start = 0
+        for poly, n in zip(self.polygons, sizes):
+            m, good = motion[start:start + n], ok[start:start + n]
+            start += n
+            shift = np.median(m[good], axis=0) if good.any() else np.zeros(2, np.float32)
+            if self.mode == "box":
+                moved.append(poly + shift)
+            else:
+                # lost vertices follow the polygon's median motion
+                moved.append(poly + np.where(good[:, None], m, shift))
+        h, w = frame.shape[:2]
+        self.polygons = [np.clip(p, 0, [w - 1, h - 1]).astype(np.float32) for p in moved]
+        self.prev_gray = gray
+        return [p.astype(np.int32) for p in self.polygons]
+
+
+class FFmpegWriter:
+    # Streams raw BGR frames into ffmpeg's stdin, so encoding runs in a
+    # separate process and nothing is buffered on disk.
+
+    def __init__(self, path: str, fps: float, size: tuple[int, int], crf: int = 23, preset: str = "veryfast"):
+        w, h = size
+        self.proc = subprocess.Popen(
+            [
+                "ffmpeg", "-loglevel", "error", "-y",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-r", f"{fps}", "-i", "-",
+                "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p", path,
+            ],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, frame: np.ndarray) -> None:
+        self.proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def release(self) -> None:
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+def open_writer(path: str, fps: float, size: tuple[int, int], encoder: str = "auto", fourcc: str = "mp4v"):
+    if encoder == "ffmpeg" or (encoder == "auto" and shutil.which("ffmpeg")):
+        return FFmpegWriter(path, fps, size)
+    return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+
+
+def polygon_mask(shape: tuple[int, int], polygons: list[np.ndarray]) -> np.ndarray:
+    mask = np.zeros(shape, dtype=np.uint8)
+    if polygons:
+        cv2.fillPoly(mask, [p.astype(np.int32) for p in polygons], 1)
+    return mask.astype(bool)
+
+
+def coverage(reference: np.ndarray, predicted: np.ndarray) -> dict:
+    # miss: share of true person pixels left unblurred (the privacy-relevant error)
+    ref = int(reference.sum())
+    pred = int(predicted.sum())
+    inter = int((reference & predicted).sum())
+    union = ref + pred - inter
+    return {
+        "miss": (ref - inter) / ref if ref else 0.0,
+        "excess": (pred - inter) / pred if pred else 0.0,
+        "iou": inter / union if union else 1.0,
+    }
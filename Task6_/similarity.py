@@ -0,0 +1,147 @@
+import cv2
+import numpy as np
+
+# One-vs-many versions of hist_sim and ssim_sim from main.ipynb, for use as a
+# re-ranking stage. Features are computed once per catalogue image and stored
+# as stacked arrays:
+#   - HSV 8x8x8 histograms, centred and L2-normalised, so the correlation used
+#     by cv2.compareHist(HISTCMP_CORREL) is a single matrix-vector product
+#   - fixed-size grayscale thumbnails plus their windowed means/variances, so
+#     SSIM against the query only needs the cross term per candidate
+# Unlike ssim_sim, which crops both images to the smaller size, SSIM here is
+# computed between equally sized thumbnails.
+
+HIST_BINS = (8, 8, 8)
+HIST_RANGES = [0, 180, 0, 256, 0, 256]
+THUMB = 64
+WIN = 7  # skimage.metrics.structural_similarity default
+K1, K2, DATA_RANGE = 0.01, 0.03, 255.0
+
+
+def gray(x):
+    return cv2.cvtColor(x, cv2.COLOR_RGB2GRAY) if x.ndim == 3 else x
+
+
+def hist_vector(rgb: np.ndarray) -> np.ndarray:
+    h = cv2.calcHist([cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)], [0, 1, 2], None, list(HIST_BINS), HIST_RANGES)
+    h = cv2.normalize(h, h).flatten().astype(np.float32)
+    h -= h.mean()
+    norm = np.linalg.norm(h)
+    # a constant histogram has no defined correlation (NaN in compareHist)
+    return h / norm if norm > 0 else np.zeros_like(h)
+
+
+def thumbnail(x: np.ndarray, size: int = THUMB) -> np.ndarray:
+    return cv2.resize(gray(x), (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def box_mean(stack: np.ndarray, win: int = WIN) -> np.ndarray:
+    # mean over every valid win x win window of an (H, W) or (N, H, W) stack.
+    # The stack is filtered as one tall image; rows whose window would straddle
+    # two images are exactly the border rows that get cut off.
+    h, w = stack.shape[-2:]
+    flat = np.ascontiguousarray(stack, dtype=np.float32).reshape(-1, w)
+    out = cv2.boxFilter(flat, -1, (win, win), normalize=True, borderType=cv2.BORDER_REFLECT)
+    r = win // 2
+    return out.reshape(stack.shape)[..., r:h - r, r:w - r]
+
+
+class ComparisonIndex:
+    def __init__(self, thumb: int = THUMB):
+        self.thumb = thumb
+        self.names: list[str] = []
+        self.hists = np.zeros((0, int(np.prod(HIST_BINS))), np.float32)
+        self.thumbs = np.zeros((0, thumb, thumb), np.float32)
+        self.mu = np.zeros((0, thumb - WIN + 1, thumb - WIN + 1), np.float32)
+        self.var = np.zeros_like(self.mu)
+        self._pending: list = []
+
+    def __len__(self) -> int:
+        return len(self.names) + len(self._pending)
+
+    def add(self, name: str, rgb: np.ndarray) -> None:
+        self._pending.append((name, hist_vector(rgb), thumbnail(rgb, self.thumb)))
+
+    def add_many(self, items) -> None:
+        for name, rgb in items:
+            self.add(name, rgb)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        names, hists, thumbs = zip(*self._pending)
+        self._pending = []
+        thumbs = np.stack(thumbs)
+        mu = box_mean(thumbs)
+        # sample variance, as skimage does by default
+        n = WIN * WIN
+        var = (box_mean(thumbs * thumbs) - mu * mu) * (n / (n - 1))
+        self.names.extend(names)
+        self.hists = np.concatenate([self.hists, np.stack(hists)])
+        self.thumbs = np.concatenate([self.thumbs, thumbs])
+        self.mu = np.concatenate([self.mu, mu])
+        self.var = np.concatenate([self.var, var])
+
+    def _select(self, idx):
+        self._flush()
+        return slice(None) if idx is None else np.asarray(idx)
+
+    def hist_scores(self, rgb: np.ndarray, idx=None) -> np.ndarray:
+        sel = self._select(idx)
+        q = hist_vector(rgb)
+        if not q.any():
+            return np.zeros(len(self.hists[sel]), np.float32)
+        scores = (self.hists[sel] @ q + 1) / 2
+        # candidates with a constant histogram score 0, matching hist_sim's NaN branch
+        scores[~self.hists[sel].any(axis=1)] = 0.0
+        return scores
+
+    def ssim_scores(self, rgb: np.ndarray, idx=None, chunk: int = 1024) -> np.ndarray:
+        sel = self._select(idx)
+        thumbs, mu_y, var_y = self.thumbs[sel], self.mu[sel], self.var[sel]
+        x = thumbnail(rgb, self.thumb)
+        mu_x = box_mean(x)
+        n = WIN * WIN
+        var_x = (box_mean(x * x) - mu_x * mu_x) * (n / (n - 1))
+        c1, c2 = (K1 * DATA_RANGE) ** 2, (K2 * DATA_RANGE) ** 2
+        out = np.empty(len(thumbs), np.float32)
+        # chunked so the (chunk, H, W) temporaries stay small
+        for start in range(0, len(thumbs), chunk):
+            ys, my, vy = thumbs[start:start + chunk], mu_y[start:start + chunk], var_y[start:start + chunk]
+            cov = (box_mean(ys * x) - mu_x * my) * (n / (n - 1))
+            s = ((2 * mu_x * my + c1) * (2 * cov + c2)) / ((mu_x ** 2 + my ** 2 + c1) * (var_x + vy + c2))
+            out[start:start + chunk] = s.reshape(len(ys), -1).mean(axis=1)
+        return out
+
+    def rank(self, rgb: np.ndarray, top_k: int = 10, weights=(0.5, 0.5), candidates: list[str] | None = None):
+        # weighted histogram + SSIM score over all images or a candidate subset
+        self._flush()
+        if candidates is not None:
+            lookup = {name: i for i, name in enumerate(self.names)}
+            idx = np.array([lookup[c] for c in candidates if c in lookup], dtype=np.int64)
+        else:
+            idx = np.arange(len(self.names))
+        if not len(idx):
+            return []
+        w_hist, w_ssim = weights
+        scores = np.zeros(len(idx), np.float32)
+        if w_hist:
+            scores += w_hist * self.hist_scores(rgb, idx)
+        if w_ssim:
+            scores += w_ssim * self.ssim_scores(rgb, idx)
+        k = min(top_k, len(idx))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[idx[i]], float(scores[i])) for i in top]
+
+    def save(self, path: str) -> None:
+        self._flush()
+        np.savez(path, names=np.array(self.names), hists=self.hists, thumbs=self.thumbs, mu=self.mu, var=self.var)
+
+    @classmethod
+    def load(cls, path: str) -> "ComparisonIndex":
+        data = np.load(path)
+        index = cls(thumb=data["thumbs"].shape[-1])
+        index.names = data["names"].tolist()
+        index.hists, index.thumbs, index.mu, index.var = data["hists"], data["thumbs"], data["mu"], data["var"]
+        return index
@@ -1,9 +1,13 @@
 from supabase import create_client
 import os 
 from dotenv import load_dotenv
+import sys
 import ollama
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from catalogue import load_catalogue
+
 load_dotenv()
 
 objecttosearch = 'objecttosearch'
@@ -18,9 +22,12 @@ key: str = os.environ.get("SUPABASE_KEY")
 supabase = create_client(url, key)
 table_name = 'objects'
 
-response = (supabase.table(table_name).select("*").execute())
+catalogue_path = os.environ.get("CATALOGUE_PATH", '.objects.cat')
 
-filename_description_map = {item['file_name']: item['Description'] for item in response.data}
+# local replica of the table; each run only fetches rows added since the last one
+filename_description_map = load_catalogue(
+    catalogue_path, lambda: supabase.table(table_name), source=f"{url}/{table_name}"
+).descriptions()
 
 # print(filename_description_map)
 
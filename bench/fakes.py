@@ -0,0 +1,146 @@
+import os
+import random
+import sys
+import time
+import types
+
+# In-process stand-ins for the Supabase and Groq clients so the servers can be
+# benchmarked without network access or API keys. Both are installed into
+# sys.modules before the server module is imported (see serve.py).
+#   BENCH_CATALOGUE        rows pre-loaded into every fake table (default 1000)
+#   BENCH_LLM_LATENCY_MS   simulated model latency per completion (default 200)
+
+WORDS = (
+    "person car street beach forest city building tree dog cat bicycle window "
+    "sky cloud road night light shadow red blue green yellow wooden metal glass "
+    "indoor outdoor crowd market river bridge mountain snow rain sunset table chair"
+).split()
+
+
+def fake_description(rng: random.Random, length: int = 60) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length)) + "."
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, rows: list, op: str = "select", payload=None):
+        self.rows = rows
+        self.op = op
+        self.payload = payload
+        self.columns = None
+        self.filters = []
+        self.order_by = []
+        self.start = None
+        self.end = None
+
+    def select(self, columns: str = "*", **kwargs):
+        if columns != "*":
+            self.columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, row):
+        self.op = "insert"
+        self.payload = row
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) >= value)
+        return self
+
+    def order(self, column, desc: bool = False):
+        self.order_by.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int):
+        self.start, self.end = start, end
+        return self
+
+    def limit(self, n: int):
+        self.start, self.end = 0, n - 1
+        return self
+
+    def execute(self):
+        if self.op == "insert":
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            stored = []
+            for row in rows:
+                row = dict(row)
+                row.setdefault("created_at", time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + f".{time.time_ns() % 10**9:09d}+00:00")
+                self.rows.append(row)
+                stored.append(row)
+            return _Result(stored)
+        rows = [r for r in self.rows if all(f(r) for f in self.filters)]
+        # stable sorts from the last key to the first, like a multi-column ORDER BY
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: r.get(column) or "", reverse=desc)
+        if self.start is not None:
+            rows = rows[self.start:self.end + 1]
+        if self.columns:
+            rows = [{c: r.get(c) for c in self.columns} for r in rows]
+        else:
+            rows = [dict(r) for r in rows]
+        return _Result(rows)
+
+
+class FakeSupabase:
+    def __init__(self, catalogue: int):
+        self.tables: dict[str, list] = {}
+        self.catalogue = catalogue
+
+    def _seed(self, name: str) -> list:
+        rng = random.Random(name)
+        rows = []
+        for i in range(self.catalogue):
+            rows.append({
+                "id": f"{i:08d}-0000-0000-0000-000000000000",
+                "file_name": f"img_{i:06d}.jpg",
+                "Description": fake_description(rng),
+                "created_at": f"2024-01-01T00:00:00.{i:06d}+00:00",
+            })
+        return rows
+
+    def table(self, name: str) -> _Query:
+        if name not in self.tables:
+            self.tables[name] = self._seed(name)
+        return _Query(self.tables[name])
+
+
+class FakeGroq:
+    def __init__(self, api_key=None, **kwargs):
+        self.latency = float(os.environ.get("BENCH_LLM_LATENCY_MS", "200")) / 1000
+        self.rng = random.Random(0)
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self.latency)
+        message = types.SimpleNamespace(content=fake_description(self.rng))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def install() -> None:
+    catalogue = int(os.environ.get("BENCH_CATALOGUE", "1000"))
+    client = FakeSupabase(catalogue)
+
+    supabase = types.ModuleType("supabase")
+    supabase.Client = FakeSupabase
+    supabase.create_client = lambda url, key: client
+    sys.modules["supabase"] = supabase
+
+    groq = types.ModuleType("groq")
+    groq.Groq = FakeGroq
+    sys.modules["groq"] = groq
+
+    try:
+        import dotenv  # noqa: F401
+    except ImportError:
+        dotenv = types.ModuleType("dotenv")
+        dotenv.load_dotenv = lambda *a, **k: False
+        sys.modules["dotenv"] = dotenv
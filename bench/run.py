@@ -0,0 +1,246 @@
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from PIL import Image
+
+# Load-test the Task3 search server and the task8 investigator server against
+# the fake backends in fakes.py, and save latency/throughput/RSS as JSON.
+#
+#   python bench/run.py --concurrency 1 8 --sizes 640x480 1920x1080 --requests 50 --out results.json
+#   python bench/run.py ... --compare results.json --tolerance 0.2
+#
+# --compare exits with status 1 if any scenario's p95 got worse than the
+# baseline by more than the tolerance, or its throughput dropped by more.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = {
+    "task3": ["/upload_image", "/search", "/imagesearch"],
+    "task8": ["/blur", "/select_object"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def make_image(width: int, height: int, seed: int = 0) -> bytes:
+    # smooth gradients plus noise so PNG/JPEG sizes look like photos, not noise or flat fills
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(1, width), y * 255 // max(1, height), (x + y) * 127 // max(1, width + height)], -1)
+    arr = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+class Server:
+    def __init__(self, name: str, cwd: str, env: dict):
+        self.name = name
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "serve.py"), name, "--port", str(self.port)],
+            cwd=cwd, env={**os.environ, **env},
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(self.url + "/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"{name} server did not start")
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def build_call(server: Server, endpoint: str, image: bytes, width: int, height: int):
+    if endpoint == "/upload_image":
+        return lambda s: s.post(server.url + endpoint, files={"image": ("bench.jpg", image, "image/jpeg")})
+    if endpoint == "/search":
+        return lambda s: s.get(server.url + endpoint, params={"word": "person street", "mode": "or"})
+    if endpoint == "/imagesearch":
+        return lambda s: s.get(server.url + endpoint, params={"image_name": "bench.jpg"})
+    selection = [{"x": width // 4, "y": height // 4, "width": width // 2, "height": height // 2}]
+    body = {"image_base64": base64.b64encode(image).decode("utf-8"), "selections": selection}
+    return lambda s: s.post(server.url + endpoint, json=body)
+
+
+def run_scenario(server: Server, call, requests_total: int, concurrency: int) -> dict:
+    local = threading.local()
+    errors = []
+    rss_samples = []
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.is_set():
+            value = rss_mb(server.proc.pid)
+            if value is not None:
+                rss_samples.append(value)
+            stop.wait(0.1)
+
+    def one(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = call(local.session)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except requests.RequestException as e:
+            errors.append(str(e))
+        return time.perf_counter() - start
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        latencies = np.array(list(ex.map(one, range(requests_total)))) * 1000
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    return {
+        "requests": requests_total,
+        "errors": len(errors),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "throughput_rps": requests_total / elapsed,
+        "rss_peak_mb": max(rss_samples) if rss_samples else None,
+        "rss_end_mb": rss_mb(server.proc.pid),
+    }
+
+
+def scenario_key(row: dict) -> tuple:
+    return row["server"], row["endpoint"], row["size"], row["concurrency"]
+
+
+def compare(results: list[dict], baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = {scenario_key(r): r for r in json.load(f)["results"]}
+    ok = True
+    for row in results:
+        old = baseline.get(scenario_key(row))
+        if old is None:
+            continue
+        p95 = row["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        rps = 1 - row["throughput_rps"] / old["throughput_rps"] if old["throughput_rps"] else 0.0
+        flag = p95 > tolerance or rps > tolerance
+        ok = ok and not flag
+        print(f"{'REGRESSION' if flag else 'ok':>10} {row['server']}{row['endpoint']} {row['size']} c={row['concurrency']}: "
+              f"p95 {old['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms ({p95:+.0%}), "
+              f"rps {old['throughput_rps']:.1f} -> {row['throughput_rps']:.1f}")
+    return ok
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servers", nargs="+", choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    parser.add_argument("--endpoints", nargs="+", help="subset of endpoints to drive")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080"])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--catalogue", type=int, default=1000, help="rows in the fake description table")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    env = {
+        "BENCH_CATALOGUE": str(args.catalogue),
+        "BENCH_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "RMBG_LOAD": "off",
+        "SUPABASE_URL": "http://fake",
+        "SUPABASE_KEY": "fake",
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "images"))
+        # keep the fake rows out of the servers' real catalogue files
+        env["CATALOGUE_PATH"] = os.path.join(workdir, "catalogue.cat")
+        for name in args.servers:
+            server = Server(name, workdir, env)
+            try:
+                for size in args.sizes:
+                    width, height = (int(v) for v in size.split("x"))
+                    image = make_image(width, height)
+                    with open(os.path.join(workdir, "images", "bench.jpg"), "wb") as f:
+                        f.write(image)
+                    for endpoint in ENDPOINTS[name]:
+                        if args.endpoints and endpoint not in args.endpoints:
+                            continue
+                        call = build_call(server, endpoint, image, width, height)
+                        call(requests.Session())  # warm-up
+                        for concurrency in args.concurrency:
+                            row = {"server": name, "endpoint": endpoint, "size": size, "concurrency": concurrency}
+                            row.update(run_scenario(server, call, args.requests, concurrency))
+                            results.append(row)
+                            print(f"{name}{endpoint:<15} {size:>10} c={concurrency:<3} "
+                                  f"p50={row['p50_ms']:8.1f} p95={row['p95_ms']:8.1f} p99={row['p99_ms']:8.1f} ms "
+                                  f"{row['throughput_rps']:8.1f} req/s rss={row['rss_peak_mb'] or 0:.0f}MB "
+                                  f"errors={row['errors']}")
+            finally:
+                server.stop()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {args.out}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+
+import uvicorn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = {
+    "task3": os.path.join(ROOT, "Task3_"),
+    "task8": os.path.join(ROOT, "task8_", "server"),
+}
+
+# Starts one of the servers with the fake backends from fakes.py.
+#   python bench/serve.py task3 --port 8100
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("server", choices=sorted(SERVERS))
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import fakes
+    fakes.install()
+
+    sys.path.insert(0, SERVERS[args.server])
+    module = "main" if args.server == "task3" else "server"
+    app = __import__(module).app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import json
+import mmap
+import os
+import time
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Compact, memory-mappable catalogue of (file_name, Description) rows plus any
+# fixed-width per-row arrays (hashes, histograms, embeddings).
+#
+# One file, opened read-only with mmap, so every worker process maps the same
+# pages and startup cost does not depend on catalogue size:
+#
+#   MAGIC (8 bytes) | header length (uint64 LE) | header JSON | sections...
+#
+# Sections are 64-byte aligned raw arrays described in the header:
+#   names / descriptions      UTF-8 blobs, each with an (N+1) uint64 offsets array
+#   name_order                row ids sorted by name, for binary-search lookup
+#   <array name>              any (N, ...) fixed-width array
+# Files are written to a temporary path and renamed into place, so readers that
+# still map the old file keep a consistent view.
+#
+# sync_catalogue() keeps a file in step with a Supabase table: the header stores
+# a created_at watermark, and each sync fetches and appends only newer rows.
+# created_at is the inserting transaction's now(), so a row can commit after a
+# sync has already moved past its timestamp; every sync therefore re-reads the
+# last SYNC_LAG seconds and skips the ids it already holds from that window.
+
+MAGIC = b"HKCAT001"
+ALIGN = 64
+SYNC_LAG = 60.0  # seconds a row may take to commit after its created_at
+
+_open: dict[str, tuple[tuple[int, int], "Catalogue"]] = {}
+_synced: dict[str, float] = {}
+
+
+def _blob(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_catalogue(path: str, names: list[str], descriptions: list[str] | None = None,
+                    arrays: dict[str, np.ndarray] | None = None, meta: dict | None = None) -> None:
+    n = len(names)
+    descriptions = descriptions if descriptions is not None else [""] * n
+    arrays = arrays or {}
+    if len(descriptions) != n or any(len(a) != n for a in arrays.values()):
+        raise ValueError("all columns must have one entry per name")
+
+    name_blob, name_offsets = _blob(names)
+    desc_blob, desc_offsets = _blob(descriptions)
+    sections = {
+        "names": name_blob,
+        "name_offsets": name_offsets,
+        "descriptions": desc_blob,
+        "description_offsets": desc_offsets,
+        "name_order": np.argsort(np.array(names, dtype=object), kind="stable").astype(np.uint32),
+    }
+    for key, value in arrays.items():
+        sections[f"array:{key}"] = np.ascontiguousarray(value)
+    _write_sections(path, n, sections, meta)
+
+
+def _write_sections(path: str, n: int, sections: dict[str, np.ndarray], meta: dict | None) -> None:
+    layout = {}
+    offset = 0
+    for key, value in sections.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout[key] = {"offset": offset, "dtype": value.dtype.str, "shape": list(value.shape)}
+        offset += value.nbytes
+    header = json.dumps({"count": n, "sections": layout, "meta": meta or {}}).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for key, value in sections.items():
+            f.seek(data_start + layout[key]["offset"])
+            f.write(value.tobytes())
+        # trailing empty sections still need their offsets inside the file
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+class Catalogue:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"not a catalogue file: {path}")
+        header_len = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(self._mmap[len(MAGIC) + 8:len(MAGIC) + 8 + header_len])
+        data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+        self.count: int = header["count"]
+        self.meta: dict = header["meta"]
+        self._sections = {}
+        for key, spec in header["sections"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            size = int(np.prod(shape)) if shape else 1
+            self._sections[key] = np.frombuffer(
+                self._mmap, dtype=dtype, count=size, offset=data_start + spec["offset"]
+            ).reshape(shape)
+        self._names = self._sections["names"]
+        self._name_offsets = self._sections["name_offsets"]
+        self._descriptions = self._sections["descriptions"]
+        self._description_offsets = self._sections["description_offsets"]
+        self._name_order = self._sections["name_order"]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def arrays(self) -> list[str]:
+        return [k.split(":", 1)[1] for k in self._sections if k.startswith("array:")]
+
+    def array(self, key: str) -> np.ndarray:
+        return self._sections[f"array:{key}"]
+
+    def name(self, i: int) -> str:
+        start, end = int(self._name_offsets[i]), int(self._name_offsets[i + 1])
+        return self._names[start:end].tobytes().decode("utf-8")
+
+    def description(self, i: int) -> str:
+        start, end = int(self._description_offsets[i]), int(self._description_offsets[i + 1])
+        return self._descriptions[start:end].tobytes().decode("utf-8")
+
+    def names(self) -> list[str]:
+        return [self.name(i) for i in range(self.count)]
+
+    def _lower_bound(self, name: str) -> int:
+        # binary search over the sorted permutation, decoding O(log n) names
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name(int(self._name_order[mid])) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def index_of(self, name: str) -> int | None:
+        j = self._lower_bound(name)
+        if j < self.count and self.name(int(self._name_order[j])) == name:
+            return int(self._name_order[j])
+        return None
+
+    def descriptions(self) -> "DescriptionMap":
+        return DescriptionMap(self)
+
+
+class DescriptionMap(Mapping):
+    # read-only {file_name: Description} view that decodes rows on access,
+    # a drop-in for the filename_description_map dicts the feeders build
+    def __init__(self, catalogue: Catalogue):
+        self.catalogue = catalogue
+
+    def __getitem__(self, name: str) -> str:
+        i = self.catalogue.index_of(name)
+        if i is None:
+            raise KeyError(name)
+        return self.catalogue.description(i)
+
+    def __iter__(self):
+        return (self.catalogue.name(i) for i in range(len(self.catalogue)))
+
+    def __len__(self) -> int:
+        return len(self.catalogue)
+
+    def items(self):
+        c = self.catalogue
+        return ((c.name(i), c.description(i)) for i in range(len(c)))
+
+
+def open_catalogue(path: str) -> Catalogue:
+    # one mapping per file version; a rewrite (new inode) is picked up on the next call
+    st = os.stat(path)
+    version = (st.st_ino, st.st_mtime_ns)
+    cached = _open.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, Catalogue(path))
+        _open[path] = cached
+    return cached[1]
+
+
+def build_catalogue(path: str, rows: list[dict], meta: dict | None = None) -> Catalogue:
+    # rows as returned by supabase: {"file_name": ..., "Description": ...};
+    # like the dicts it replaces, a repeated file_name keeps its last Description
+    latest = {row["file_name"]: row.get("Description") or "" for row in rows}
+    write_catalogue(
+        path,
+        list(latest),
+        list(latest.values()),
+        meta={"built_at": time.time(), **(meta or {})},
+    )
+    return open_catalogue(path)
+
+
+def append_catalogue(path: str, rows: list[dict], meta: dict | None = None) -> Catalogue:
+    # adds rows without re-encoding the ones already stored: blobs and offsets are
+    # concatenated and the new names merged into name_order by binary search
+    c = open_catalogue(path)
+    if c.arrays:
+        raise ValueError("append_catalogue only supports description catalogues")
+    latest = {row["file_name"]: row.get("Description") or "" for row in rows}
+    meta = {**c.meta, **(meta or {})}
+    if any(c.index_of(name) is not None for name in latest):
+        # a re-uploaded file_name replaces its Description, which needs a rebuild
+        merged = dict(c.descriptions().items())
+        merged.update(latest)
+        write_catalogue(path, list(merged), list(merged.values()), meta=meta)
+        return open_catalogue(path)
+
+    names = list(latest)
+    name_blob, name_offsets = _blob(names)
+    desc_blob, desc_offsets = _blob(list(latest.values()))
+    by_name = sorted(range(len(names)), key=names.__getitem__)
+    sections = {
+        "names": np.concatenate([c._names, name_blob]),
+        "name_offsets": np.concatenate([c._name_offsets, name_offsets[1:] + c._name_offsets[-1]]),
+        "descriptions": np.concatenate([c._descriptions, desc_blob]),
+        "description_offsets": np.concatenate([c._description_offsets, desc_offsets[1:] + c._description_offsets[-1]]),
+        "name_order": np.insert(
+            c._name_order,
+            [c._lower_bound(names[i]) for i in by_name],
+            np.array(by_name, dtype=np.uint32) + np.uint32(c.count),
+        ),
+    }
+    _write_sections(path, c.count + len(names), sections, meta)
+    return open_catalogue(path)
+
+
+def fetch_rows_since(query, watermark: str | None = None, column: str = "created_at",
+                     page_size: int = 1000) -> list[dict]:
+    # query() returns a fresh supabase table query, e.g. lambda: supabase.table("images")
+    rows, ids = [], set()
+    while True:
+        q = query().select(f"id,file_name,Description,{column}")
+        if watermark is not None:
+            # gte, not gt: rows sharing the start timestamp may have landed after the last sync
+            q = q.gte(column, watermark)
+        # id breaks created_at ties (rows from one transaction share now()), so
+        # offset pages stay stable between queries
+        q = q.order(column).order("id")
+        page = q.range(len(ids), len(ids) + page_size - 1).execute().data
+        for row in page:
+            if row["id"] not in ids:
+                ids.add(row["id"])
+                rows.append(row)
+        if len(page) < page_size:
+            return rows
+
+
+def _timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _since(watermark: str, lag: float) -> str:
+    return (_timestamp(watermark) - timedelta(seconds=lag)).isoformat(timespec="microseconds")
+
+
+def _watermark(rows: list[dict], column: str, watermark: str | None, recent: list, lag: float) -> dict:
+    # keeps [id, timestamp] for every row stamped within lag of the newest one,
+    # which is exactly what the next sync re-reads
+    stamped = dict(recent)
+    stamped.update((row["id"], row[column]) for row in rows if row.get(column) is not None)
+    times = list(stamped.values()) + ([watermark] if watermark is not None else [])
+    if not times:
+        return {"watermark": None, "recent": []}
+    newest = max(times, key=_timestamp)
+    cutoff = _timestamp(newest) - timedelta(seconds=lag)
+    return {"watermark": newest,
+            "recent": sorted([i, t] for i, t in stamped.items() if _timestamp(t) >= cutoff)}
+
+
+def sync_catalogue(path: str, query, column: str = "created_at", page_size: int = 1000,
+                   source: str | None = None, lag: float = SYNC_LAG) -> Catalogue:
+    # fetches only rows stamped since watermark - lag, drops the ids already taken
+    # from that window and appends the rest; a missing file, one without a
+    # watermark, or one built from a different source (e.g. "<supabase url>/<table>")
+    # gets a full fetch
+    c = open_catalogue(path) if os.path.exists(path) else None
+    watermark = None
+    if c is not None and c.meta.get("source") == source and "recent" in c.meta:
+        watermark = c.meta.get("watermark")
+    if watermark is None:
+        rows = fetch_rows_since(query, None, column, page_size)
+        return build_catalogue(path, rows, meta={"source": source, **_watermark(rows, column, None, [], lag)})
+    recent = c.meta["recent"]
+    seen = {i for i, _ in recent}
+    rows = [row for row in fetch_rows_since(query, _since(watermark, lag), column, page_size)
+            if row["id"] not in seen]
+    if not rows:
+        return c
+    return append_catalogue(path, rows, meta=_watermark(rows, column, watermark, recent, lag))
+
+
+def load_catalogue(path: str, query, max_age: float = 0.0, column: str = "created_at",
+                   source: str | None = None, lag: float = SYNC_LAG) -> Catalogue:
+    # syncs at most once every max_age seconds per process; in between the
+    # current file is used as is
+    last = _synced.get(path)
+    if last is not None and time.monotonic() - last < max_age and os.path.exists(path):
+        return open_catalogue(path)
+    c = sync_catalogue(path, query, column, source=source, lag=lag)
+    _synced[path] = time.monotonic()
+    return c
+
+
+def expire_catalogue(path: str) -> None:
+    # forces the next load_catalogue() in this process to sync
+    _synced.pop(path, None)
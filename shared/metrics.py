@@ -0,0 +1,191 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+
+# Lightweight request/stage instrumentation shared by the FastAPI servers.
+#
+#   from metrics import instrument, span
+#   instrument(app, "task3")
+#   with span("inference"):
+#       ...
+#
+# Exposes /metrics in Prometheus text format. Recording a span is a dict lookup
+# and a few additions under a lock, so it is cheap enough to leave on.
+# Set METRICS_PROFILER=1 to also enable /debug/profile, a sampling profiler
+# that returns collapsed stacks (flamegraph.pl / speedscope input).
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def route_name(scope) -> str:
+    # the router adds scope["route"]; label by its template to keep cardinality bounded
+    route = scope.get("route") if scope is not None else None
+    return getattr(route, "path", None) or "unmatched"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.durations: dict[tuple, Histogram] = {}
+        self.stages: dict[tuple, Histogram] = {}
+        self.in_flight = 0
+        self.started = time.time()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self.lock:
+            self.requests[(method, route, str(status))] += 1
+            key = (method, route)
+            hist = self.durations.get(key)
+            if hist is None:
+                hist = self.durations[key] = Histogram()
+            hist.observe(seconds)
+
+    def observe_stage(self, stage: str, route: str, seconds: float) -> None:
+        with self.lock:
+            key = (stage, route)
+            hist = self.stages.get(key)
+            if hist is None:
+                hist = self.stages[key] = Histogram()
+            hist.observe(seconds)
+
+    def render(self, service: str) -> str:
+        lines = []
+
+        def labels(**kv) -> str:
+            return "{" + ",".join(f'{k}="{v}"' for k, v in kv.items()) + "}"
+
+        def histogram(name: str, data: dict, keys: tuple):
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(data.items()):
+                base = dict(zip(keys, key), service=service)
+                cumulative = 0
+                for bound, n in zip(BUCKETS, hist.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{labels(**base, le=bound)} {cumulative}")
+                lines.append(f"{name}_bucket{labels(**base, le='+Inf')} {hist.count}")
+                lines.append(f"{name}_sum{labels(**base)} {hist.sum:.6f}")
+                lines.append(f"{name}_count{labels(**base)} {hist.count}")
+
+        with self.lock:
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), n in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{labels(service=service, method=method, route=route, status=status)} {n}")
+            lines.append("# TYPE http_requests_in_flight gauge")
+            lines.append(f"http_requests_in_flight{labels(service=service)} {self.in_flight}")
+            histogram("http_request_duration_seconds", self.durations, ("method", "route"))
+            histogram("stage_duration_seconds", self.stages, ("stage", "route"))
+            lines.append("# TYPE process_uptime_seconds gauge")
+            lines.append(f"process_uptime_seconds{labels(service=service)} {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe_stage(stage, route_name(_scope.get()), time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    # plain ASGI middleware: no request body buffering, works with streaming responses
+    def __init__(self, app, registry: Registry = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _scope.set(scope)
+        with self.registry.lock:
+            self.registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.registry.lock:
+                self.registry.in_flight -= 1
+            self.registry.observe_request(scope.get("method", ""), route_name(scope), status["code"], elapsed)
+            _scope.reset(token)
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float) -> Counter:
+        stacks: Counter = Counter()
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = ";".join(f"{f.name} ({f.filename.rsplit('/', 1)[-1]}:{f.lineno})"
+                                 for f in traceback.extract_stack(frame))
+                stacks[stack] += 1
+            time.sleep(interval)
+        return stacks
+
+
+def instrument(app: FastAPI, service: str, profiler: bool = False) -> FastAPI:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(service), media_type="text/plain; version=0.0.4")
+
+    if profiler or os.environ.get("METRICS_PROFILER") == "1":
+        sampler = SamplingProfiler()
+
+        @app.get("/debug/profile", include_in_schema=False)
+        def profile(seconds: float = 5.0, interval: float = 0.005):
+            if not sampler.lock.acquire(blocking=False):
+                raise HTTPException(status_code=409, detail="A profile is already running.")
+            try:
+                stacks = sampler.sample(min(max(seconds, 0.1), 60.0), max(interval, 0.001))
+            finally:
+                sampler.lock.release()
+            body = "\n".join(f"{stack} {n}" for stack, n in stacks.most_common())
+            return PlainTextResponse(body + "\n")
+
+    return app
@@ -0,0 +1,119 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+from catalogue import build_catalogue, load_catalogue, sync_catalogue
+from fakes import FakeSupabase
+
+# Run with: python -m pytest shared
+
+
+def stamp(second: int, micro: int = 0) -> str:
+    return f"2024-01-01T00:{second // 60:02d}:{second % 60:02d}.{micro:06d}+00:00"
+
+
+def insert(table: list, i: int, created_at: str, name: str | None = None, description: str | None = None):
+    table.append({
+        "id": f"new-{i:06d}",
+        "file_name": name or f"new_{i:06d}.jpg",
+        "Description": description or f"description {i}",
+        "created_at": created_at,
+    })
+
+
+def expected(table: list) -> dict:
+    # what a full re-read gives: rows in (created_at, id) order, last file_name wins
+    return {r["file_name"]: r["Description"] for r in sorted(table, key=lambda r: (r["created_at"], r["id"]))}
+
+
+def setup(tmp_path, rows: int = 50):
+    supabase = FakeSupabase(rows)
+    return str(tmp_path / "images.cat"), supabase, supabase.table("images").rows, lambda: supabase.table("images")
+
+
+def test_full_build(tmp_path):
+    path, _, table, query = setup(tmp_path)
+    c = sync_catalogue(path, query, page_size=7, source="a")
+    assert dict(c.descriptions().items()) == expected(table)
+    assert c.meta["watermark"] == table[-1]["created_at"]
+
+
+def test_appends_only_new_rows(tmp_path):
+    path, _, table, query = setup(tmp_path)
+    sync_catalogue(path, query, source="a")
+    for i in range(5):
+        insert(table, i, stamp(10))
+    c = sync_catalogue(path, query, page_size=2, source="a")
+    assert "built_at" in c.meta and len(c) == 55
+    assert dict(c.descriptions().items()) == expected(table)
+    # nothing new: the file is not rewritten
+    assert sync_catalogue(path, query, page_size=2, source="a") is c
+
+
+def test_rows_sharing_the_watermark(tmp_path):
+    path, _, table, query = setup(tmp_path, rows=0)
+    insert(table, 0, stamp(5))
+    sync_catalogue(path, query, source="a")
+    insert(table, 1, stamp(5))
+    c = sync_catalogue(path, query, source="a")
+    assert sorted(c.names()) == ["new_000000.jpg", "new_000001.jpg"]
+
+
+def test_late_commit_inside_lag(tmp_path):
+    path, _, table, query = setup(tmp_path, rows=0)
+    insert(table, 0, stamp(30))
+    sync_catalogue(path, query, source="a", lag=20)
+    # stamped before the watermark, but committed after the last sync
+    insert(table, 1, stamp(15))
+    insert(table, 2, stamp(5))
+    c = sync_catalogue(path, query, source="a", lag=20)
+    assert sorted(c.names()) == ["new_000000.jpg", "new_000001.jpg"]
+    assert c.meta["watermark"] == stamp(30)
+    assert [i for i, _ in c.meta["recent"]] == ["new-000000", "new-000001"]
+
+
+def test_window_follows_the_watermark(tmp_path):
+    path, _, table, query = setup(tmp_path, rows=0)
+    insert(table, 0, stamp(0))
+    insert(table, 1, stamp(50))
+    c = sync_catalogue(path, query, source="a", lag=20)
+    assert [i for i, _ in c.meta["recent"]] == ["new-000001"]
+    insert(table, 2, stamp(100))
+    c = sync_catalogue(path, query, source="a", lag=20)
+    assert [i for i, _ in c.meta["recent"]] == ["new-000002"]
+    assert len(c) == 3
+
+
+def test_reupload_replaces_description(tmp_path):
+    path, _, table, query = setup(tmp_path, rows=3)
+    sync_catalogue(path, query, source="a")
+    insert(table, 0, stamp(1), name="img_000001.jpg", description="replaced")
+    c = sync_catalogue(path, query, source="a")
+    assert len(c) == 3 and c.descriptions()["img_000001.jpg"] == "replaced"
+    assert dict(c.descriptions().items()) == expected(table)
+
+
+def test_other_source_rebuilds(tmp_path):
+    path, _, _, query = setup(tmp_path, rows=5)
+    sync_catalogue(path, query, source="a")
+    other = FakeSupabase(2)
+    c = sync_catalogue(path, lambda: other.table("images"), source="b")
+    assert c.meta["source"] == "b" and len(c) == 2
+
+
+def test_file_without_window_rebuilds(tmp_path):
+    path, _, table, query = setup(tmp_path, rows=5)
+    c = sync_catalogue(path, query, source="a")
+    meta = {k: v for k, v in c.meta.items() if k != "recent"}
+    build_catalogue(path, [], meta=meta)
+    c = sync_catalogue(path, query, source="a")
+    assert dict(c.descriptions().items()) == expected(table)
+
+
+def test_load_catalogue_throttles_syncs(tmp_path):
+    path, _, table, query = setup(tmp_path, rows=5)
+    load_catalogue(path, query, max_age=60, source="a")
+    insert(table, 0, stamp(10))
+    assert len(load_catalogue(path, query, max_age=60, source="a")) == 5
+    assert len(load_catalogue(path, query, max_age=0, source="a")) == 6
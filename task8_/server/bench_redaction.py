@@ -0,0 +1,87 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from redaction import blackout_image, blur_image
+
+# Compares the original per-rectangle PIL blur/blackout with the union-of-boxes
+# NumPy engine across image sizes and selection counts.
+#   python bench_redaction.py --sizes 1024x768 4000x3000 --counts 1 8 32 64
+
+
+def legacy_blur(img: Image.Image, rects) -> Image.Image:
+    base = img.copy()
+    for x0, y0, x1, y1 in rects:
+        region = img.crop((x0, y0, x1, y1)).filter(ImageFilter.GaussianBlur(radius=10))
+        base.paste(region, (x0, y0))
+    return base
+
+
+def legacy_blackout(img: Image.Image, rects) -> Image.Image:
+    img = img.copy()
+    draw = ImageDraw.Draw(img)
+    for x0, y0, x1, y1 in rects:
+        draw.rectangle([x0, y0, x1, y1], fill=(0, 0, 0, 255))
+    return img
+
+
+def random_rects(rng, width: int, height: int, count: int):
+    # clustered boxes so that a realistic share of them overlap
+    rects = []
+    centers = rng.integers(0, [width, height], size=(max(1, count // 4), 2))
+    for i in range(count):
+        cx, cy = centers[i % len(centers)] + rng.integers(-width // 20, width // 20 + 1, size=2)
+        bw, bh = rng.integers(width // 40 + 1, width // 8 + 2), rng.integers(height // 40 + 1, height // 8 + 2)
+        x0, y0 = int(min(max(0, cx - bw // 2), width - 1)), int(min(max(0, cy - bh // 2), height - 1))
+        rects.append((x0, y0, int(min(width, x0 + bw)), int(min(height, y0 + bh))))
+    return rects
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["1024x768", "2048x1536", "4000x3000", "6000x4000"])
+    parser.add_argument("--counts", nargs="+", type=int, default=[1, 4, 16, 32, 64])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"{'size':>10} {'boxes':>6} {'blur legacy':>12} {'blur new':>10} {'blackout legacy':>16} {'blackout new':>13}")
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        arr = rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+        img = Image.fromarray(arr)
+        for count in args.counts:
+            rects = random_rects(rng, width, height, count)
+            row = {
+                "size": size,
+                "boxes": count,
+                "blur_legacy_ms": timeit(lambda: legacy_blur(img, rects), args.repeat),
+                "blur_ms": timeit(lambda: blur_image(img, rects), args.repeat),
+                "blackout_legacy_ms": timeit(lambda: legacy_blackout(img, rects), args.repeat),
+                "blackout_ms": timeit(lambda: blackout_image(img, rects), args.repeat),
+            }
+            results.append(row)
+            print(f"{size:>10} {count:>6} {row['blur_legacy_ms']:>12.1f} {row['blur_ms']:>10.1f} "
+                  f"{row['blackout_legacy_ms']:>16.1f} {row['blackout_ms']:>13.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from rembg import remove  # type: ignore
+
+from rmbg_pool import SessionPool
+
+# Cold-start time and requests/sec of background removal for several pool
+# sizes and client concurrency levels.
+#   python bench_rmbg.py --pool-sizes 1 2 --concurrency 1 4 8 --requests 32
+
+
+def run(pool: SessionPool, img: Image.Image, requests: int, concurrency: int) -> dict:
+    def one(_):
+        start = time.perf_counter()
+        with pool.session() as session:
+            remove(img, session=session, alpha_matting=True,
+                   alpha_matting_foreground_threshold=240,
+                   alpha_matting_background_threshold=10,
+                   alpha_matting_erode_size=10)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        latencies = sorted(ex.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "rps": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="isnet-general-use")
+    parser.add_argument("--pool-sizes", nargs="+", type=int, default=[1, 2])
+    parser.add_argument("--intra-op-threads", type=int, default=0)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--size", default="640x480")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    rng = np.random.default_rng(0)
+    img = Image.fromarray(rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8))
+
+    results = []
+    for size in args.pool_sizes:
+        pool = SessionPool(args.model, size=size, intra_op_threads=args.intra_op_threads)
+        pool.start(background=False)
+        if pool.state != "ready":
+            raise SystemExit(f"model failed to load: {pool.error}")
+        print(f"pool={size} cold start {pool.cold_start_seconds:.2f}s")
+        with pool.session() as session:
+            remove(img, session=session)  # warm-up
+        for concurrency in args.concurrency:
+            row = run(pool, img, args.requests, concurrency)
+            row.update({"pool_size": size, "cold_start_seconds": pool.cold_start_seconds})
+            results.append(row)
+            print(f"  concurrency={concurrency:>3} {row['rps']:.2f} req/s "
+                  f"p50={row['p50_ms']:.0f}ms p95={row['p95_ms']:.0f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import threading
+from typing import Any, Callable
+
+import numpy as np
+from PIL import Image
+
+from image_cache import ImageCache
+from redaction import region_array
+
+
+# Working image for one replay. Ops that can edit pixels in place share a single
+# ndarray; it is converted from/to PIL only when an op needs an Image, at
+# checkpoints and for the final result, instead of once per op.
+class Frame:
+    def __init__(self, img: Image.Image):
+        self._img: Image.Image | None = img
+        self._arr: np.ndarray | None = None
+
+    @property
+    def size(self) -> tuple[int, int]:
+        if self._img is not None:
+            return self._img.size
+        return self._arr.shape[1], self._arr.shape[0]
+
+    def array(self) -> np.ndarray:
+        # always a private copy, so cached images are never written to
+        if self._arr is None:
+            self._arr = region_array(self._img, (0, 0) + self._img.size)
+            self._img = None
+        return self._arr
+
+    def set_array(self, arr: np.ndarray) -> None:
+        self._img, self._arr = None, arr
+
+    def image(self) -> Image.Image:
+        if self._img is None:
+            # shares the buffer; array() copies again before the next in-place op
+            self._img, self._arr = Image.fromarray(self._arr), None
+        return self._img
+
+    def set_image(self, img: Image.Image) -> None:
+        self._img, self._arr = img, None
+
+
+# Ordered, non-destructive edit list for one session handle. The original image
+# stays in the cache under the handle; intermediate results are stored as cache
+# entries every `checkpoint_every` ops so undo/redo replays only a short tail.
+# Checkpoints live in the same LRU, so they are bounded by its memory budget and
+# simply get recomputed if evicted.
+class EditHistory:
+    def __init__(self, handle: str, checkpoint_every: int = 4):
+        self.handle = handle
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.ops: list[Any] = []
+        self.cursor = 0
+        self.checkpoints: set[int] = set()
+        self.lock = threading.Lock()
+
+    def _key(self, index: int) -> str:
+        return f"{self.handle}:ckpt:{index}"
+
+    def _drop_checkpoints(self, cache: ImageCache, above: int) -> None:
+        for index in [i for i in self.checkpoints if i > above]:
+            cache.delete(self._key(index))
+            self.checkpoints.discard(index)
+
+    def push(self, ops: list[Any], cache: ImageCache) -> None:
+        with self.lock:
+            # new edits after an undo discard the redo tail
+            self._drop_checkpoints(cache, self.cursor)
+            del self.ops[self.cursor:]
+            self.ops.extend(ops)
+            self.cursor = len(self.ops)
+
+    def undo(self, steps: int = 1) -> None:
+        with self.lock:
+            self.cursor = max(0, self.cursor - steps)
+
+    def redo(self, steps: int = 1) -> None:
+        with self.lock:
+            self.cursor = min(len(self.ops), self.cursor + steps)
+
+    def clear(self, cache: ImageCache) -> None:
+        with self.lock:
+            self._drop_checkpoints(cache, 0)
+            self.ops = []
+            self.cursor = 0
+
+    def state(self) -> dict:
+        return {
+            "handle": self.handle,
+            "cursor": self.cursor,
+            "length": len(self.ops),
+            "can_undo": self.cursor > 0,
+            "can_redo": self.cursor < len(self.ops),
+        }
+
+    def render(self, cache: ImageCache, apply_op: Callable[[Frame, Any], None]) -> Image.Image:
+        with self.lock:
+            img = cache.get(self.handle)
+            if img is None:
+                raise KeyError(self.handle)
+            start = 0
+            for index in sorted(self.checkpoints, reverse=True):
+                if index > self.cursor:
+                    continue
+                cached = cache.get(self._key(index))
+                if cached is None:
+                    self.checkpoints.discard(index)
+                    continue
+                img, start = cached, index
+                break
+
+            frame = Frame(img)
+            for i in range(start, self.cursor):
+                apply_op(frame, self.ops[i])
+                done = i + 1
+                if done % self.checkpoint_every == 0 and done not in self.checkpoints:
+                    try:
+                        cache.put(frame.image(), self._key(done))
+                        self.checkpoints.add(done)
+                    except MemoryError:
+                        pass
+            return frame.image()
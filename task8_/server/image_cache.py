@@ -0,0 +1,74 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from PIL import Image
+
+
+# Memory-bounded LRU of decoded images keyed by an opaque handle, with idle TTL.
+class ImageCache:
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, ttl: float = 900.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[Image.Image, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def _drop(self, handle: str) -> None:
+        _, size, _ = self._entries.pop(handle)
+        self._bytes -= size
+
+    def _evict(self, now: float) -> None:
+        # entries are in access order, so expired ones sit at the front
+        while self._entries:
+            handle, (_, _, last) = next(iter(self._entries.items()))
+            if now - last <= self.ttl and self._bytes <= self.max_bytes:
+                break
+            self._drop(handle)
+
+    def put(self, img: Image.Image, handle: str | None = None) -> str:
+        size = self._size(img)
+        if size > self.max_bytes:
+            raise MemoryError("image larger than the cache budget")
+        handle = handle or uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            if handle in self._entries:
+                self._drop(handle)
+            self._entries[handle] = (img, size, now)
+            self._bytes += size
+            self._evict(now)
+        return handle
+
+    def get(self, handle: str) -> Image.Image | None:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            img, size, _ = entry
+            self._entries[handle] = (img, size, now)
+            self._entries.move_to_end(handle)
+            return img
+
+    def delete(self, handle: str) -> bool:
+        with self._lock:
+            if handle not in self._entries:
+                return False
+            self._drop(handle)
+            return True
+
+    def __contains__(self, handle: str) -> bool:
+        with self._lock:
+            return handle in self._entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, "ttl": self.ttl}
@@ -0,0 +1,178 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from redaction import blurred_pieces
+
+try:
+    from ultralytics import YOLO  # type: ignore
+except Exception:
+    YOLO = None
+
+PERSON_CLASS = 0  # COCO
+
+
+# One segmentation model per process. Requests are queued and a single worker
+# thread collects up to `max_batch` of them (waiting at most `max_wait` seconds
+# after the first) into one predict() call, so concurrent clients share
+# inference instead of each running the model alone. The queue holds at most
+# `max_queue` frames; requests whose caller gave up (cancelled futures) are
+# dropped before inference.
+class PersonBatcher:
+    def __init__(self, model_name: str = "yolov8n-seg.pt", max_batch: int = 8, max_wait: float = 0.01,
+                 imgsz: int = 640, conf: float = 0.25, device: str = "cpu", max_queue: int = 32):
+        self.model_name = model_name
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.imgsz = imgsz
+        self.conf = conf
+        self.device = device
+        self.model = None
+        self.state = "idle" if YOLO is not None else "unavailable"
+        self.error: str | None = None
+        self.batches = 0
+        self.images = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self._queue: "queue.Queue[tuple[np.ndarray, Future]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls) -> "PersonBatcher":
+        return cls(
+            model_name=os.environ.get("PERSON_MODEL", "yolov8n-seg.pt"),
+            max_batch=int(os.environ.get("PERSON_MAX_BATCH", "8")),
+            max_wait=float(os.environ.get("PERSON_MAX_WAIT_MS", "10")) / 1000,
+            imgsz=int(os.environ.get("PERSON_IMGSZ", "640")),
+            conf=float(os.environ.get("PERSON_CONF", "0.25")),
+            device=os.environ.get("PERSON_DEVICE", "cpu"),
+            max_queue=int(os.environ.get("PERSON_MAX_QUEUE", "32")),
+        )
+
+    def start(self) -> None:
+        with self._lock:
+            if self._worker is not None or self.state == "unavailable":
+                return
+            self.state = "loading"
+            self._worker = threading.Thread(target=self._loop, name="person-batcher", daemon=True)
+            self._worker.start()
+
+    def _load(self) -> bool:
+        try:
+            self.model = YOLO(self.model_name)
+            self.state = "ready"
+            return True
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            return False
+
+    def _claim(self, item, batch: list) -> None:
+        # False means the caller already cancelled (e.g. timed out): skip it
+        if item[1].set_running_or_notify_cancel():
+            batch.append(item)
+        else:
+            self.cancelled += 1
+
+    def _collect(self) -> list:
+        batch: list = []
+        while not batch:
+            self._claim(self._queue.get(), batch)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                self._claim(self._queue.get(timeout=remaining), batch)
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        loaded = self._load()
+        while True:
+            batch = self._collect()
+            if not loaded:
+                for _, future in batch:
+                    future.set_exception(RuntimeError(f"person model unavailable: {self.error}"))
+                continue
+            frames = [frame for frame, _ in batch]
+            try:
+                results = self.model.predict(frames, imgsz=self.imgsz, conf=self.conf, device=self.device,
+                                             classes=[PERSON_CLASS], verbose=False)
+                self.batches += 1
+                self.images += len(frames)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(person_detections(result))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def submit(self, frame_bgr: np.ndarray) -> Future:
+        if self.state == "unavailable":
+            raise RuntimeError("ultralytics is not installed (pip install -r requirements-people.txt)")
+        self.start()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((frame_bgr, future))
+        except queue.Full:
+            self.rejected += 1
+            raise RuntimeError("person segmentation queue is full")
+        return future
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "error": self.error,
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch": self.images / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+        }
+
+
+def person_detections(result) -> list[dict]:
+    if result.masks is None or result.boxes is None:
+        return []
+    classes = result.boxes.cls.cpu().numpy().astype(int)
+    confs = result.boxes.conf.cpu().numpy()
+    boxes = result.boxes.xyxy.cpu().numpy()
+    people = []
+    for seg, cls, conf, box in zip(result.masks.xy, classes, confs, boxes):
+        if cls != PERSON_CLASS or len(seg) < 3:
+            continue
+        people.append({
+            "box": [int(v) for v in box],
+            "confidence": float(conf),
+            "polygon": np.asarray(seg, dtype=np.int32).tolist(),
+        })
+    return people
+
+
+def blur_polygons(rgba: np.ndarray, polygons: list[np.ndarray], sigma: float = 15.0) -> np.ndarray:
+    # blur only the union of the person boxes and composite the polygon pixels
+    out = rgba.copy()
+    if not polygons:
+        return out
+    h, w = rgba.shape[:2]
+    rects = []
+    for poly in polygons:
+        x, y, bw, bh = cv2.boundingRect(poly)
+        rects.append((x, y, x + bw, y + bh))
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.fillPoly(mask, polygons, 255)
+    for (x0, y0, x1, y1), pixels in blurred_pieces(rgba, rects, sigma):
+        sel = mask[y0:y1, x0:x1] == 255
+        out[y0:y1, x0:x1][sel] = pixels[sel]
+    return out
@@ -0,0 +1,170 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+# Rectangles are (x0, y0, x1, y1) with exclusive x1/y1.
+
+# From this sigma up the blur runs on a downsampled copy; a Gaussian this wide
+# removes the detail the downsampling would lose anyway.
+DOWNSAMPLE_SIGMA = 4.0
+
+
+def clip_rects(rects, width: int, height: int) -> list[tuple[int, int, int, int]]:
+    out = []
+    for x0, y0, x1, y1 in rects:
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(width, x1), min(height, y1)
+        if x1 > x0 and y1 > y0:
+            out.append((x0, y0, x1, y1))
+    return out
+
+
+def union_rects(rects) -> list[tuple[int, int, int, int]]:
+    # split the union of the rectangles into disjoint ones: one row band between
+    # consecutive y edges, merged x intervals per band, and bands with the same
+    # intervals joined vertically
+    ys = sorted({y for _, y0, _, y1 in rects for y in (y0, y1)})
+    out: list[list[int]] = []
+    open_: dict[tuple[int, int], list[int]] = {}
+    for ya, yb in zip(ys, ys[1:]):
+        spans = sorted((x0, x1) for x0, y0, x1, y1 in rects if y0 <= ya and y1 >= yb)
+        merged: list[list[int]] = []
+        for x0, x1 in spans:
+            if merged and x0 <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], x1)
+            else:
+                merged.append([x0, x1])
+        current = {}
+        for x0, x1 in merged:
+            box = open_.get((x0, x1))
+            if box is not None and box[3] == ya:
+                box[3] = yb
+            else:
+                box = [x0, ya, x1, yb]
+                out.append(box)
+            current[(x0, x1)] = box
+        open_ = current
+    return [tuple(b) for b in out]
+
+
+def downsample_factor(sigma: float, width: int, height: int) -> int:
+    factor = int(sigma // (DOWNSAMPLE_SIGMA / 2))
+    if sigma < DOWNSAMPLE_SIGMA or factor < 2 or min(width, height) < 2 * factor:
+        return 1
+    return factor
+
+
+def context_margin(sigma: float, width: int, height: int) -> int:
+    # how far outside the selection blurred_pieces() reads pixels
+    return int(np.ceil(3 * sigma)) + 3 * downsample_factor(sigma, width, height)
+
+
+def blurred_pieces(arr: np.ndarray, rects, sigma: float):
+    # Gaussian blur of `arr` evaluated only on the union of `rects`, returned as
+    # (rect, pixels) for disjoint rects covering it. Unselected pixels are only
+    # read as context (within 3 sigma) and never blurred.
+    h, w = arr.shape[:2]
+    pieces = union_rects(clip_rects(rects, w, h))
+    if not pieces:
+        return []
+    pad = int(np.ceil(3 * sigma))
+    factor = downsample_factor(sigma, w, h)
+    if factor == 1:
+        out = []
+        for x0, y0, x1, y1 in pieces:
+            px0, py0 = max(0, x0 - pad), max(0, y0 - pad)
+            window = arr[py0:min(h, y1 + pad), px0:min(w, x1 + pad)]
+            out.append(((x0, y0, x1, y1),
+                        cv2.GaussianBlur(window, (0, 0), sigma)[y0 - py0:y1 - py0, x0 - px0:x1 - px0]))
+        return out
+
+    # Downsample the padded union onto one grid of factor x factor cells shared by
+    # all pieces (an extra 2 cells so interpolation never reaches unfilled cells),
+    # blur that once, then upsample only the selected pixels.
+    f = factor
+    cw, ch = -(-w // f), -(-h // f)
+    pad += 2 * f
+    cells = union_rects(clip_rects(
+        [((x0 - pad) // f, (y0 - pad) // f, -(-(x1 + pad) // f), -(-(y1 + pad) // f)) for x0, y0, x1, y1 in pieces],
+        cw, ch,
+    ))
+    bx0, by0 = min(c[0] for c in cells), min(c[1] for c in cells)
+    bx1, by1 = max(c[2] for c in cells), max(c[3] for c in cells)
+    small = np.zeros((by1 - by0, bx1 - bx0) + arr.shape[2:], arr.dtype)
+    for cx0, cy0, cx1, cy1 in cells:
+        src = arr[cy0 * f:cy1 * f, cx0 * f:cx1 * f]
+        if src.shape[0] != (cy1 - cy0) * f or src.shape[1] != (cx1 - cx0) * f:
+            # partial cells at the right/bottom edge: reflect so every cell is full
+            src = cv2.copyMakeBorder(src, 0, (cy1 - cy0) * f - src.shape[0], 0, (cx1 - cx0) * f - src.shape[1],
+                                     cv2.BORDER_REFLECT)
+        dst = small[cy0 - by0:cy1 - by0, cx0 - bx0:cx1 - bx0]
+        # reshape: cv2 drops a trailing single channel
+        dst[...] = cv2.resize(src, (cx1 - cx0, cy1 - cy0), interpolation=cv2.INTER_AREA).reshape(dst.shape)
+    small = cv2.GaussianBlur(small, (0, 0), sigma / f).reshape(small.shape)
+
+    out = []
+    for x0, y0, x1, y1 in pieces:
+        # one cell of margin so the bilinear upsample matches a full-frame resize
+        cx0, cy0 = max(bx0, x0 // f - 1), max(by0, y0 // f - 1)
+        cx1, cy1 = min(bx1, -(-x1 // f) + 1), min(by1, -(-y1 // f) + 1)
+        size = ((cx1 - cx0) * f, (cy1 - cy0) * f)
+        up = cv2.resize(small[cy0 - by0:cy1 - by0, cx0 - bx0:cx1 - bx0], size, interpolation=cv2.INTER_LINEAR)
+        up = up.reshape(size[::-1] + arr.shape[2:])
+        out.append(((x0, y0, x1, y1), up[y0 - cy0 * f:y1 - cy0 * f, x0 - cx0 * f:x1 - cx0 * f]))
+    return out
+
+
+def blackout_array(arr: np.ndarray, rects, fill=(0, 0, 0, 255), inplace: bool = False) -> np.ndarray:
+    out = arr if inplace else arr.copy()
+    h, w = out.shape[:2]
+    value = fill[:out.shape[2]] if out.ndim == 3 else fill[0]
+    for x0, y0, x1, y1 in clip_rects(rects, w, h):
+        out[y0:y1, x0:x1] = value
+    return out
+
+
+def blur_array(arr: np.ndarray, rects, sigma: float = 10.0, inplace: bool = False) -> np.ndarray:
+    out = arr if inplace else arr.copy()
+    # every piece is computed before any is written, so in-place reads stay clean
+    for (x0, y0, x1, y1), pixels in blurred_pieces(arr, rects, sigma):
+        out[y0:y1, x0:x1] = pixels
+    return out
+
+
+# PIL front-ends. Blackout pastes straight into a copy; blur converts only the
+# selection's bounding box plus blur context to one ndarray, blurs that in place
+# and pastes it back once (PIL -> NumPy conversion costs as much as the blur).
+
+def blackout_image(img: Image.Image, rects, fill=(0, 0, 0, 255)) -> Image.Image:
+    out = img.copy()
+    for rect in clip_rects(rects, img.width, img.height):
+        out.paste(fill[:len(img.getbands())], rect)
+    return out
+
+
+def region_array(img: Image.Image, box) -> np.ndarray:
+    # writable ndarray copy of img.crop(box). np.array() goes through tobytes()
+    # and costs ~5x a memcpy; for modes PIL stores byte-for-byte like NumPy, paste
+    # straight into a frombuffer view of a preallocated array instead
+    x0, y0, x1, y1 = box
+    if img.mode not in ("RGBA", "L"):
+        return np.array(img.crop(box))
+    arr = np.empty((y1 - y0, x1 - x0) + ((4,) if img.mode == "RGBA" else ()), np.uint8)
+    view = Image.frombuffer(img.mode, (x1 - x0, y1 - y0), arr, "raw", img.mode, 0, 1)
+    # core paste: the public one would copy the read-only view first
+    view.im.paste(img.im, (-x0, -y0, img.width - x0, img.height - y0))
+    return arr
+
+
+def blur_image(img: Image.Image, rects, sigma: float = 10.0) -> Image.Image:
+    out = img.copy()
+    rects = clip_rects(rects, img.width, img.height)
+    if not rects:
+        return out
+    margin = context_margin(sigma, img.width, img.height)
+    x0, y0 = max(0, min(r[0] for r in rects) - margin), max(0, min(r[1] for r in rects) - margin)
+    x1, y1 = min(img.width, max(r[2] for r in rects) + margin), min(img.height, max(r[3] for r in rects) + margin)
+    region = region_array(img, (x0, y0, x1, y1))
+    blur_array(region, [(rx0 - x0, ry0 - y0, rx1 - x0, ry1 - y0) for rx0, ry0, rx1, ry1 in rects], sigma, inplace=True)
+    out.paste(Image.fromarray(region), (x0, y0))
+    return out
@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import onnxruntime as ort  # type: ignore
+    from rembg import new_session  # type: ignore
+    from rembg.sessions import sessions_class  # type: ignore
+except Exception:
+    ort = None
+    new_session = None
+    sessions_class = []
+
+
+# Pool of rembg sessions built with explicit ONNX Runtime thread settings.
+# Loading happens off the request path ("background") or on first use ("lazy"),
+# so importing the server and answering /health never wait for the model.
+class SessionPool:
+    def __init__(
+        self,
+        model_name: str = "isnet-general-use",
+        size: int = 1,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 1,
+        wait_seconds: float = 30.0,
+    ):
+        self.model_name = model_name
+        self.size = max(1, size)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.wait_seconds = wait_seconds
+        self.state = "idle" if new_session is not None else "unavailable"
+        self.error: str | None = None
+        self.cold_start_seconds: float | None = None
+        self.requests = 0
+        self.in_use = 0
+        self._sessions: "queue.Queue" = queue.Queue()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SessionPool":
+        return cls(
+            model_name=os.environ.get("RMBG_MODEL", "isnet-general-use"),
+            size=int(os.environ.get("RMBG_POOL_SIZE", "1")),
+            intra_op_threads=int(os.environ.get("RMBG_INTRA_OP_THREADS", "0")),
+            inter_op_threads=int(os.environ.get("RMBG_INTER_OP_THREADS", "1")),
+            wait_seconds=float(os.environ.get("RMBG_WAIT_SECONDS", "30")),
+        )
+
+    def _session_options(self):
+        opts = ort.SessionOptions()
+        # 0 lets ONNX Runtime pick; otherwise split the cores across the pool
+        if self.intra_op_threads > 0:
+            opts.intra_op_num_threads = self.intra_op_threads
+        elif self.size > 1:
+            opts.intra_op_num_threads = max(1, (os.cpu_count() or 1) // self.size)
+        opts.inter_op_num_threads = max(1, self.inter_op_threads)
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return opts
+
+    def _build_session(self):
+        for session_class in sessions_class:
+            if session_class.name() == self.model_name:
+                return session_class(self.model_name, self._session_options(), None)
+        return new_session(self.model_name)
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        try:
+            for _ in range(self.size):
+                self._sessions.put(self._build_session())
+            self.cold_start_seconds = time.perf_counter() - start
+            self.state = "ready"
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self._ready.set()
+
+    def disable(self) -> None:
+        with self._lock:
+            self.state = "disabled"
+        self._ready.set()
+
+    def start(self, background: bool = True) -> None:
+        with self._lock:
+            if self.state != "idle":
+                return
+            self.state = "loading"
+        if background:
+            threading.Thread(target=self._load, name="rmbg-loader", daemon=True).start()
+        else:
+            self._load()
+
+    @contextmanager
+    def session(self):
+        # yields None when the model is unavailable so callers can fall back
+        if self.state == "idle":
+            self.start(background=True)
+        if self.state in ("disabled", "unavailable", "failed"):
+            yield None
+            return
+        if not self._ready.wait(self.wait_seconds) or self.state != "ready":
+            yield None
+            return
+        try:
+            session = self._sessions.get(timeout=self.wait_seconds)
+        except queue.Empty:
+            yield None
+            return
+        with self._lock:
+            self.requests += 1
+            self.in_use += 1
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._sessions.put(session)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "error": self.error,
+            "pool_size": self.size,
+            "in_use": self.in_use,
+            "requests": self.requests,
+            "cold_start_seconds": self.cold_start_seconds,
+        }
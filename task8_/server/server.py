@@ -1,17 +1,44 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from typing import List
-from PIL import Image, ImageFilter
+import json
+import os
+import threading
+import sys
+from PIL import Image
 import io
 import base64
 import numpy as np
 import cv2
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared"))
+from metrics import instrument, span
+from image_cache import ImageCache
+from edit_pipeline import EditHistory, Frame
+from redaction import blackout_array, blackout_image, blur_array, blur_image
+from rmbg_pool import SessionPool
+from person_blur import PersonBatcher, blur_polygons
+from contextlib import asynccontextmanager
+from concurrent.futures import TimeoutError as FutureTimeout
 try:
-    from rembg import remove, new_session  # type: ignore
-    _RMBG_SESSION = new_session("isnet-general-use")
+    from rembg import remove  # type: ignore
 except Exception:
-    _RMBG_SESSION = None
+    remove = None
+
+# RMBG_LOAD: "background" (default) starts loading at startup without blocking it,
+# "lazy" loads on the first /select_object, "off" always uses the OpenCV fallback
+_RMBG_LOAD = os.environ.get("RMBG_LOAD", "background")
+_RMBG_POOL = SessionPool.from_env()
+if _RMBG_LOAD == "off" or remove is None:
+    _RMBG_POOL.disable()
+
+# PERSON_LOAD: "lazy" (default) loads the segmentation model on the first
+# /blur_people request, "background" loads it at startup
+_PERSON_LOAD = os.environ.get("PERSON_LOAD", "lazy")
+_PERSON_TIMEOUT = float(os.environ.get("PERSON_TIMEOUT", "120"))
+_PERSON_BATCHER = PersonBatcher.from_env()
 
 
 class Rect(BaseModel):
@@ -41,7 +68,47 @@ class ProcessResponse(BaseModel):
     image_base64: str
 
 
-app = FastAPI(title="Investigator Tool API")
+class SessionOpRequest(BaseModel):
+    selections: List[Rect] = []
+    commit: bool = False
+
+
+class EditOp(BaseModel):
+    op: str
+    selections: List[Rect] = []
+
+
+class EditListRequest(BaseModel):
+    operations: List[EditOp]
+
+
+class EditRequest(BaseModel):
+    image_base64: str
+    operations: List[EditOp]
+
+
+class StepRequest(BaseModel):
+    steps: int = 1
+
+
+class PeopleRequest(BaseModel):
+    image_base64: str
+    selections: List[Rect] = []
+    output: str = "image"
+    sigma: float = 15.0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if _RMBG_LOAD == "background":
+        _RMBG_POOL.start(background=True)
+    if _PERSON_LOAD == "background":
+        _PERSON_BATCHER.start()
+    yield
+
+
+app = FastAPI(title="Investigator Tool API", lifespan=lifespan)
+instrument(app, "task8")
 
 app.add_middleware(
     CORSMiddleware,
@@ -52,15 +119,45 @@ app.add_middleware(
 )
 
 
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+_SELECTIONS = TypeAdapter(List[Rect])
+
+
+def bytes_to_image(raw: bytes) -> Image.Image:
+    with span("decode"):
+        return Image.open(io.BytesIO(raw)).convert("RGBA")
+
+
 def b64_to_image(data: str) -> Image.Image:
-    raw = base64.b64decode(data)
-    return Image.open(io.BytesIO(raw)).convert("RGBA")
+    with span("b64_decode"):
+        raw = base64.b64decode(data)
+    return bytes_to_image(raw)
 
 
-def image_to_b64(img: Image.Image) -> str:
+def encode_image(img: Image.Image, fmt: str = "png", quality: int = 90, compression: int = 6) -> bytes:
+    pil_format, _ = OUTPUT_FORMATS[fmt]
     buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+    with span("encode"):
+        if pil_format == "PNG":
+            img.save(buf, format="PNG", compress_level=compression)
+        elif pil_format == "JPEG":
+            # JPEG has no alpha channel
+            img.convert("RGB").save(buf, format="JPEG", quality=quality)
+        else:
+            img.save(buf, format=pil_format, quality=quality, method=min(compression, 6))
+    return buf.getvalue()
+
+
+def image_to_b64(img: Image.Image) -> str:
+    raw = encode_image(img)
+    with span("b64_encode"):
+        return base64.b64encode(raw).decode("utf-8")
 
 
 def crop_to_alpha_bbox(img: Image.Image) -> Image.Image:
@@ -93,49 +190,56 @@ def enhance_rgba(img: Image.Image) -> Image.Image:
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "rmbg": _RMBG_POOL.stats(), "people": _PERSON_BATCHER.stats()}
+
+
+def clamp_rect(img: Image.Image | Frame, r: Rect) -> tuple[int, int, int, int]:
+    width, height = img.size
+    x0 = max(0, r.x)
+    y0 = max(0, r.y)
+    x1 = min(width, r.x + r.width)
+    y1 = min(height, r.y + r.height)
+    return x0, y0, x1, y1
+
+
+def apply_crop(img: Image.Image, selections: List[Rect]) -> Image.Image:
+    if not selections:
+        return img
+    return img.crop(clamp_rect(img, selections[0]))
+
+
+def selection_rects(img: Image.Image | Frame, selections: List[Rect]) -> list[tuple[int, int, int, int]]:
+    return [clamp_rect(img, r) for r in selections]
+
+
+def apply_blackout(img: Image.Image, selections: List[Rect]) -> Image.Image:
+    if not selections:
+        return img
+    return blackout_image(img, selection_rects(img, selections))
+
+
+def apply_blur(img: Image.Image, selections: List[Rect]) -> Image.Image:
+    if not selections:
+        return img
+    return blur_image(img, selection_rects(img, selections), sigma=10.0)
 
 
 @app.post("/crop", response_model=ProcessResponse)
 def crop(req: ProcessRequest):
     img = b64_to_image(req.image_base64)
-    if not req.selections:
-        return {"image_base64": image_to_b64(img)}
-    r = req.selections[0]
-    left = max(0, r.x)
-    top = max(0, r.y)
-    right = min(img.width, r.x + r.width)
-    bottom = min(img.height, r.y + r.height)
-    cropped = img.crop((left, top, right, bottom))
-    return {"image_base64": image_to_b64(cropped)}
+    return {"image_base64": image_to_b64(apply_crop(img, req.selections))}
 
 
 @app.post("/blackout", response_model=ProcessResponse)
 def blackout(req: ProcessRequest):
     img = b64_to_image(req.image_base64)
-    from PIL import ImageDraw
-    draw = ImageDraw.Draw(img)
-    for r in req.selections:
-        x0 = max(0, r.x)
-        y0 = max(0, r.y)
-        x1 = min(img.width, r.x + r.width)
-        y1 = min(img.height, r.y + r.height)
-        draw.rectangle([x0, y0, x1, y1], fill=(0, 0, 0, 255))
-    return {"image_base64": image_to_b64(img)}
+    return {"image_base64": image_to_b64(apply_blackout(img, req.selections))}
 
 
 @app.post("/blur", response_model=ProcessResponse)
 def blur(req: ProcessRequest):
     img = b64_to_image(req.image_base64)
-    base = img.copy()
-    for r in req.selections:
-        x0 = max(0, r.x)
-        y0 = max(0, r.y)
-        x1 = min(img.width, r.x + r.width)
-        y1 = min(img.height, r.y + r.height)
-        region = img.crop((x0, y0, x1, y1)).filter(ImageFilter.GaussianBlur(radius=10))
-        base.paste(region, (x0, y0))
-    return {"image_base64": image_to_b64(base)}
+    return {"image_base64": image_to_b64(apply_blur(img, req.selections))}
 
 
 @app.post("/select")
@@ -153,12 +257,100 @@ def deselect(req: PointRequest):
     return {"selections": [s.model_dump() for s in remaining]}
 
 
-@app.post("/select_object", response_model=ProcessResponse)
-def select_object(req: ProcessRequest):
-    img_pil = b64_to_image(req.image_base64)
-    if not req.selections:
-        return {"image_base64": image_to_b64(img_pil)}
-    r = req.selections[0]
+# OpenCV fallback for /select_object. Works on a padded crop around the
+# selection only, and above GRABCUT_MAX_PIXELS runs GrabCut on a downscaled
+# copy and upsamples the mask with an edge-aware guided filter.
+GRABCUT_MAX_PIXELS = int(os.environ.get("GRABCUT_MAX_PIXELS", "250000"))
+GRABCUT_PAD = 0.1
+
+
+def saliency_seed(roi_bgr: np.ndarray) -> np.ndarray | None:
+    if not hasattr(cv2, "saliency") or not roi_bgr.size:
+        return None
+    try:
+        sal = cv2.saliency.StaticSaliencyFineGrained_create()
+        ok, sal_map = sal.computeSaliency(roi_bgr)
+        if not ok:
+            return None
+        sal_uint8 = (sal_map * 255).astype(np.uint8)
+        _, sal_bin = cv2.threshold(sal_uint8, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        sal_bin = cv2.morphologyEx(sal_bin, cv2.MORPH_CLOSE, kernel, iterations=2)
+        cnts, _ = cv2.findContours(sal_bin, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if cnts:
+            cnt = max(cnts, key=cv2.contourArea)
+            sal_mask_roi = np.zeros_like(sal_bin)
+            cv2.drawContours(sal_mask_roi, [cnt], -1, 255, thickness=cv2.FILLED)
+            return sal_mask_roi
+        return sal_bin
+    except Exception:
+        return None
+
+
+def refine_mask(prob: np.ndarray, guide_bgr: np.ndarray) -> np.ndarray:
+    # prob is a float32 foreground map at full crop resolution
+    if hasattr(cv2, "ximgproc"):
+        try:
+            radius = max(2, min(guide_bgr.shape[:2]) // 100)
+            prob = cv2.ximgproc.guidedFilter(guide_bgr, prob, radius, 1e-3)
+        except Exception:
+            pass
+    return np.where(prob >= 0.5, 255, 0).astype(np.uint8)
+
+
+def grabcut_roi(img_pil: Image.Image, box: tuple[int, int, int, int]) -> Image.Image:
+    x, y, x1, y1 = box
+    pad = int(max(x1 - x, y1 - y) * GRABCUT_PAD) + 8
+    px, py = max(0, x - pad), max(0, y - pad)
+    px1, py1 = min(img_pil.width, x1 + pad), min(img_pil.height, y1 + pad)
+    crop_bgr = cv2.cvtColor(np.asarray(img_pil.crop((px, py, px1, py1))), cv2.COLOR_RGBA2BGR)
+    # selection coordinates inside the padded crop
+    rx, ry, rx1, ry1 = x - px, y - py, x1 - px, y1 - py
+
+    scale = 1.0
+    area = (px1 - px) * (py1 - py)
+    if area > GRABCUT_MAX_PIXELS:
+        scale = (GRABCUT_MAX_PIXELS / area) ** 0.5
+    if scale < 1.0:
+        work = cv2.resize(crop_bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        work = crop_bgr
+    wh, ww = work.shape[:2]
+    sx, sy = int(rx * scale), int(ry * scale)
+    sx1, sy1 = max(sx + 1, min(ww, int(round(rx1 * scale)))), max(sy + 1, min(wh, int(round(ry1 * scale))))
+
+    # saliency is computed once, at the working scale, and only over the selection
+    seed = saliency_seed(work[sy:sy1, sx:sx1])
+    gc_mask = np.full((wh, ww), cv2.GC_BGD, np.uint8)
+    gc_mask[sy:sy1, sx:sx1] = cv2.GC_PR_BGD
+    if seed is None:
+        gc_mask[sy:sy1, sx:sx1] = cv2.GC_PR_FGD
+    else:
+        gc_mask[sy:sy1, sx:sx1][seed > 0] = cv2.GC_PR_FGD
+    bgdModel = np.zeros((1, 65), np.float64)
+    fgdModel = np.zeros((1, 65), np.float64)
+    try:
+        cv2.grabCut(work, gc_mask, None, bgdModel, fgdModel, 3, cv2.GC_INIT_WITH_MASK)
+    except Exception:
+        pass
+    fg = (gc_mask == cv2.GC_FGD) | (gc_mask == cv2.GC_PR_FGD)
+
+    if scale < 1.0:
+        prob = cv2.resize(fg.astype(np.float32), (crop_bgr.shape[1], crop_bgr.shape[0]), interpolation=cv2.INTER_LINEAR)
+        alpha = refine_mask(prob, crop_bgr)
+    else:
+        alpha = np.where(fg, 255, 0).astype(np.uint8)
+
+    roi = crop_bgr[ry:ry1, rx:rx1]
+    rgba = cv2.cvtColor(roi, cv2.COLOR_BGR2RGBA)
+    rgba[..., 3] = alpha[ry:ry1, rx:rx1]
+    return Image.fromarray(rgba)
+
+
+def apply_select_object(img_pil: Image.Image, selections: List[Rect]) -> Image.Image:
+    if not selections:
+        return img_pil
+    r = selections[0]
     x = max(0, r.x)
     y = max(0, r.y)
     w = max(1, r.width)
@@ -169,69 +361,314 @@ def select_object(req: ProcessRequest):
     roi_pil = img_pil.crop((x, y, x1, y1)).convert("RGBA")
 
     out_pil: Image.Image | None = None
-    if _RMBG_SESSION is not None:
-        try:
-            out = remove(
-                roi_pil,
-                session=_RMBG_SESSION,
-                alpha_matting=True,
-                alpha_matting_foreground_threshold=240,
-                alpha_matting_background_threshold=10,
-                alpha_matting_erode_size=10,
-            )
-            out_pil = out if isinstance(out, Image.Image) else Image.open(io.BytesIO(out)).convert("RGBA")
-        except Exception:
-            out_pil = None
+    with _RMBG_POOL.session() as session:
+        if session is not None:
+            try:
+                with span("inference"):
+                    out = remove(
+                        roi_pil,
+                        session=session,
+                        alpha_matting=True,
+                        alpha_matting_foreground_threshold=240,
+                        alpha_matting_background_threshold=10,
+                        alpha_matting_erode_size=10,
+                    )
+                out_pil = out if isinstance(out, Image.Image) else Image.open(io.BytesIO(out)).convert("RGBA")
+            except Exception:
+                out_pil = None
 
     if out_pil is None:
-        img_rgba = np.array(img_pil)
-        img_bgr = cv2.cvtColor(img_rgba, cv2.COLOR_RGBA2BGR)
-        roi = img_bgr[y:y1, x:x1]
-        mask_full = np.zeros(img_bgr.shape[:2], dtype=np.uint8)
-        used_saliency = False
-        if hasattr(cv2, "saliency") and roi.size:
+        with span("inference"):
+            out_pil = grabcut_roi(img_pil, (x, y, x1, y1))
+
+    out_pil = crop_to_alpha_bbox(out_pil)
+    return enhance_rgba(out_pil)
+
+
+@app.post("/select_object", response_model=ProcessResponse)
+def select_object(req: ProcessRequest):
+    img = b64_to_image(req.image_base64)
+    return {"image_base64": image_to_b64(apply_select_object(img, req.selections))}
+
+
+def detect_people(img: Image.Image, selections: List[Rect] | None = None) -> list[dict]:
+    frame = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGBA2BGR)
+    try:
+        with span("inference"):
+            future = _PERSON_BATCHER.submit(frame)
             try:
-                sal = cv2.saliency.StaticSaliencyFineGrained_create()
-                ok, sal_map = sal.computeSaliency(roi)
-                if ok:
-                    sal_uint8 = (sal_map * 255).astype(np.uint8)
-                    _, sal_bin = cv2.threshold(sal_uint8, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-                    sal_bin = cv2.morphologyEx(sal_bin, cv2.MORPH_CLOSE, kernel, iterations=2)
-                    cnts, _ = cv2.findContours(sal_bin, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                    if cnts:
-                        cnt = max(cnts, key=cv2.contourArea)
-                        sal_mask_roi = np.zeros_like(sal_bin)
-                        cv2.drawContours(sal_mask_roi, [cnt], -1, 255, thickness=cv2.FILLED)
-                    else:
-                        sal_mask_roi = sal_bin
-                    mask_full[y:y1, x:x1] = sal_mask_roi
-                    used_saliency = True
-            except Exception:
-                used_saliency = False
+                people = future.result(timeout=_PERSON_TIMEOUT)
+            except FutureTimeout:
+                # drop the frame if it has not reached the model yet
+                future.cancel()
+                raise RuntimeError(f"timed out after {_PERSON_TIMEOUT:g}s")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Person segmentation unavailable: {e}")
+    if selections:
+        # only people whose box overlaps one of the selections
+        rects = selection_rects(img, selections)
+        people = [
+            p for p in people
+            if any(p["box"][0] < x1 and x0 < p["box"][2] and p["box"][1] < y1 and y0 < p["box"][3]
+                   for x0, y0, x1, y1 in rects)
+        ]
+    return people
+
+
+def redact_people(img: Image.Image, people: list[dict], sigma: float = 15.0) -> Image.Image:
+    if not people:
+        return img
+    polygons = [np.asarray(p["polygon"], dtype=np.int32) for p in people]
+    return Image.fromarray(blur_polygons(np.asarray(img), polygons, sigma))
+
+
+def apply_blur_people(img: Image.Image, selections: List[Rect]) -> Image.Image:
+    return redact_people(img, detect_people(img, selections))
+
+
+@app.post("/blur_people")
+def blur_people(req: PeopleRequest):
+    if req.output not in ("image", "masks"):
+        raise HTTPException(status_code=400, detail="output must be 'image' or 'masks'.")
+    img = b64_to_image(req.image_base64)
+    people = detect_people(img, req.selections)
+    if req.output == "masks":
+        return {"width": img.width, "height": img.height, "people": people}
+    return {"image_base64": image_to_b64(redact_people(img, people, req.sigma)), "count": len(people)}
+
+
+# Binary transport: same operations, raw image bytes in and out.
+# Accepts either multipart/form-data (fields "image" and "selections") or a raw
+# image body with the selections JSON passed as the "selections" query param.
+
+def parse_selections(raw: str | None) -> List[Rect]:
+    if not raw:
+        return []
+    try:
+        return _SELECTIONS.validate_python(json.loads(raw))
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid selections: {e}")
+
+
+async def read_binary_request(request: Request) -> tuple[Image.Image, List[Rect]]:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="Missing image file field.")
+        raw = await upload.read()
+        selections = parse_selections(form.get("selections") or request.query_params.get("selections"))
+    else:
+        raw = await request.body()
+        selections = parse_selections(request.query_params.get("selections"))
+    if not raw:
+        raise HTTPException(status_code=422, detail="Empty image body.")
+    try:
+        # decoding a large image takes long enough to stall every other request
+        img = await run_in_threadpool(bytes_to_image, raw)
+    except Exception:
+        raise HTTPException(status_code=415, detail="Unsupported or corrupt image.")
+    return img, selections
+
+
+def binary_response(img: Image.Image, format: str, quality: int, compression: int) -> Response:
+    if format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(OUTPUT_FORMATS)}")
+    quality = max(1, min(quality, 100))
+    compression = max(0, min(compression, 9))
+    body = encode_image(img, format, quality, compression)
+    return Response(content=body, media_type=OUTPUT_FORMATS[format][1])
+
+
+BINARY_OPS = {
+    "crop": apply_crop,
+    "blackout": apply_blackout,
+    "blur": apply_blur,
+    "select_object": apply_select_object,
+    "blur_people": apply_blur_people,
+}
+
+
+@app.post("/binary/{op}")
+async def binary_op(op: str, request: Request, format: str = "png", quality: int = 90, compression: int = 1):
+    fn = BINARY_OPS.get(op)
+    if fn is None:
+        raise HTTPException(status_code=404, detail=f"Unknown operation: {op}")
+    img, selections = await read_binary_request(request)
+    out = await run_in_threadpool(fn, img, selections)
+    return await run_in_threadpool(binary_response, out, format, quality, compression)
+
+
+# Sessions: upload once, then operate by handle on the cached decoded image.
+
+_IMAGE_CACHE = ImageCache(
+    max_bytes=int(os.environ.get("IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    ttl=float(os.environ.get("IMAGE_CACHE_TTL", "900")),
+)
+
+
+_HISTORIES: dict[str, EditHistory] = {}
+_HISTORIES_LOCK = threading.Lock()
+
+
+def session_image(handle: str) -> Image.Image:
+    img = _IMAGE_CACHE.get(handle)
+    if img is None:
+        with _HISTORIES_LOCK:
+            _HISTORIES.pop(handle, None)
+        raise HTTPException(status_code=404, detail="Unknown or expired session.")
+    return img
+
+
+def session_history(handle: str) -> EditHistory:
+    session_image(handle)
+    with _HISTORIES_LOCK:
+        history = _HISTORIES.get(handle)
+        if history is None:
+            history = _HISTORIES[handle] = EditHistory(handle)
+        return history
+
+
+def prune_histories() -> None:
+    with _HISTORIES_LOCK:
+        for handle in [h for h in _HISTORIES if h not in _IMAGE_CACHE]:
+            del _HISTORIES[handle]
+
+
+def validate_ops(operations: List[EditOp]) -> None:
+    for item in operations:
+        if item.op not in BINARY_OPS:
+            raise HTTPException(status_code=422, detail=f"Unknown operation: {item.op}")
+
+
+def edit_crop(frame: Frame, selections: List[Rect]) -> None:
+    x0, y0, x1, y1 = clamp_rect(frame, selections[0])
+    if x1 > x0 and y1 > y0:
+        frame.set_array(frame.array()[y0:y1, x0:x1])
+    else:
+        frame.set_image(apply_crop(frame.image(), selections))
 
-        if not used_saliency:
-            mask_full[y:y1, x:x1] = 255
 
-        gc_mask = np.zeros(img_bgr.shape[:2], np.uint8)
-        gc_mask[:] = cv2.GC_BGD
-        gc_mask[y:y1, x:x1] = cv2.GC_PR_BGD
-        gc_mask[mask_full > 0] = cv2.GC_PR_FGD
-        bgdModel = np.zeros((1, 65), np.float64)
-        fgdModel = np.zeros((1, 65), np.float64)
+# ops that edit the frame's ndarray in place during a replay; the rest go through PIL
+ARRAY_OPS = {
+    "crop": edit_crop,
+    "blackout": lambda frame, selections: blackout_array(frame.array(), selection_rects(frame, selections), inplace=True),
+    "blur": lambda frame, selections: blur_array(frame.array(), selection_rects(frame, selections), 10.0, inplace=True),
+}
+
+
+def apply_edit(frame: Frame, item: EditOp) -> None:
+    if item.op in ARRAY_OPS:
+        # like apply_crop/apply_blackout/apply_blur, no selections is a no-op
+        if item.selections:
+            ARRAY_OPS[item.op](frame, item.selections)
+    else:
+        frame.set_image(BINARY_OPS[item.op](frame.image(), item.selections))
+
+
+def render_session(handle: str) -> Image.Image:
+    history = session_history(handle)
+    try:
+        return history.render(_IMAGE_CACHE, apply_edit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired session.")
+
+
+@app.post("/session")
+async def create_session(request: Request):
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Malformed JSON body.")
+        if not isinstance(payload, dict) or not isinstance(payload.get("image_base64"), str):
+            raise HTTPException(status_code=422, detail="Expected a JSON object with an image_base64 string.")
         try:
-            cv2.grabCut(img_bgr, gc_mask, None, bgdModel, fgdModel, 3, cv2.GC_INIT_WITH_MASK)
+            img = await run_in_threadpool(b64_to_image, payload["image_base64"])
         except Exception:
-            pass
-        mask2 = np.where((gc_mask == cv2.GC_FGD) | (gc_mask == cv2.GC_PR_FGD), 255, 0).astype("uint8")
-        b, g, r_b = cv2.split(img_bgr)
-        rgba = cv2.merge([b, g, r_b, mask2])
-        out_pil = Image.fromarray(cv2.cvtColor(rgba, cv2.COLOR_BGRA2RGBA))
-        out_pil = out_pil.crop((x, y, x1, y1))
-
-    out_pil = crop_to_alpha_bbox(out_pil)
-    out_pil = enhance_rgba(out_pil)
-    return {"image_base64": image_to_b64(out_pil)}
+            raise HTTPException(status_code=415, detail="Unsupported or corrupt image.")
+    else:
+        img, _ = await read_binary_request(request)
+    prune_histories()
+    try:
+        handle = _IMAGE_CACHE.put(img)
+    except MemoryError:
+        raise HTTPException(status_code=413, detail="Image too large for the session cache.")
+    return {"handle": handle, "width": img.width, "height": img.height}
+
+
+@app.get("/session/{handle}")
+def export_session(handle: str, format: str = "png", quality: int = 90, compression: int = 6):
+    return binary_response(render_session(handle), format, quality, compression)
+
+
+@app.delete("/session/{handle}")
+def delete_session(handle: str):
+    with _HISTORIES_LOCK:
+        history = _HISTORIES.pop(handle, None)
+    if history is not None:
+        history.clear(_IMAGE_CACHE)
+    if not _IMAGE_CACHE.delete(handle):
+        raise HTTPException(status_code=404, detail="Unknown or expired session.")
+    return {"status": "deleted"}
+
+
+@app.post("/session/{handle}/edits")
+def push_edits(handle: str, req: EditListRequest):
+    validate_ops(req.operations)
+    history = session_history(handle)
+    history.push(req.operations, _IMAGE_CACHE)
+    return history.state()
+
+
+@app.get("/session/{handle}/edits")
+def list_edits(handle: str):
+    history = session_history(handle)
+    state = history.state()
+    state["operations"] = [item.model_dump() for item in history.ops]
+    return state
+
+
+@app.post("/session/{handle}/undo")
+def undo(handle: str, req: StepRequest = StepRequest()):
+    history = session_history(handle)
+    history.undo(max(1, req.steps))
+    return history.state()
+
+
+@app.post("/session/{handle}/redo")
+def redo(handle: str, req: StepRequest = StepRequest()):
+    history = session_history(handle)
+    history.redo(max(1, req.steps))
+    return history.state()
+
+
+@app.post("/session/{handle}/{op}")
+def session_op(handle: str, op: str, req: SessionOpRequest, format: str = "png", quality: int = 90, compression: int = 1):
+    fn = BINARY_OPS.get(op)
+    if fn is None:
+        raise HTTPException(status_code=404, detail=f"Unknown operation: {op}")
+    out = fn(render_session(handle), req.selections)
+    if req.commit:
+        # committing bakes the current edit state into the session base image
+        session_history(handle).clear(_IMAGE_CACHE)
+        _IMAGE_CACHE.put(out, handle)
+    return binary_response(out, format, quality, compression)
+
+
+@app.post("/edit", response_model=ProcessResponse)
+def edit(req: EditRequest):
+    validate_ops(req.operations)
+    frame = Frame(b64_to_image(req.image_base64))
+    for item in req.operations:
+        apply_edit(frame, item)
+    return {"image_base64": image_to_b64(frame.image())}
+
+
+@app.get("/cache_stats")
+def cache_stats():
+    return _IMAGE_CACHE.stats()
 
 
 if __name__ == "__main__":